@@ -6,3 +6,8 @@ class BackofficeAppConfig(AppConfig):
 
     name = "backoffice_extensions"
     verbose_name = _("Backoffice")
+
+    def ready(self):
+        from backoffice_extensions.sidebar import connect_signals
+
+        connect_signals()
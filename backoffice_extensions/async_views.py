@@ -0,0 +1,158 @@
+import asyncio
+from typing import Dict, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Paginator
+from django.db import models
+from django.http import Http404
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.utils.translation import gettext as _
+
+from backoffice_extensions.mixins import AsyncBackOfficeViewMixin
+from backoffice_extensions.profiling import profile_phase
+from backoffice_extensions.queries import optimize_queryset
+from backoffice_extensions.statistics import aget_statistics
+from backoffice_extensions.views import (
+    BackOfficeCreateView,
+    BackOfficeDetailView,
+    BackOfficeEditView,
+    BackOfficeIndexView,
+    BackOfficeListView,
+)
+
+try:
+    from django.shortcuts import aget_object_or_404
+except ImportError:  # Django < 5.0
+
+    async def aget_object_or_404(queryset: models.QuerySet, *args, **kwargs):
+        try:
+            return await queryset.aget(*args, **kwargs)
+        except queryset.model.DoesNotExist:
+            raise Http404(
+                f"No {queryset.model._meta.object_name} matches the given query."
+            )
+
+
+class AsyncBackOfficeListView(AsyncBackOfficeViewMixin, BackOfficeListView):
+    """Async version of BackOfficeListView. With the default paginator_class, the
+    count and the rows of the page are fetched with the async ORM. The other
+    paginators and the filterset_class, whose forms can run queries, are run in a
+    thread. Conditional GET is not supported.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pagination: Optional[Tuple] = None
+
+    async def aget_queryset(self) -> models.QuerySet:
+        if self.filterset_class:
+            return await sync_to_async(self.get_queryset)()
+        return self.get_queryset()
+
+    async def apaginate_queryset(self, queryset: models.QuerySet, page_size: int):
+        if self.paginator_class is not Paginator:
+            return await sync_to_async(super().paginate_queryset)(queryset, page_size)
+        paginator = self.paginator_class(
+            queryset,
+            page_size,
+            orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty(),
+            **self.paginator_kwargs,
+        )
+        with profile_phase("count"):
+            paginator.count = await queryset.acount()
+        page_number = self.kwargs.get(self.page_kwarg) or self.request.GET.get(
+            self.page_kwarg, 1
+        )
+        if page_number == "last":
+            page_number = paginator.num_pages
+        try:
+            page = paginator.page(page_number)
+        except InvalidPage as error:
+            raise Http404(_("Invalid page: %(message)s") % {"message": str(error)})
+        # Iterating the queryset fills its cache, so it's kept for the templates
+        with profile_phase("page"):
+            async for obj in page.object_list:
+                pass
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def paginate_queryset(self, queryset, page_size):
+        """Uses the page fetched by apaginate_queryset."""
+        if self.pagination is not None:
+            return self.pagination
+        return super().paginate_queryset(queryset, page_size)
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = await self.aget_queryset()
+        if not self.get_allow_empty() and not await self.object_list.aexists():
+            raise Http404(
+                _("Empty list and “%(class_name)s.allow_empty” is False.")
+                % {"class_name": self.__class__.__name__}
+            )
+        page_size = self.get_paginate_by(self.object_list)
+        if page_size:
+            self.pagination = await self.apaginate_queryset(self.object_list, page_size)
+        context = self.get_context_data()
+        return self.render_to_response(context)
+
+
+class AsyncBackOfficeDetailView(AsyncBackOfficeViewMixin, BackOfficeDetailView):
+    """Async version of BackOfficeDetailView, that gets the object with the async
+    ORM. Conditional GET is not supported.
+    """
+
+    async def aget_object(self, pk: int) -> models.Model:
+        queryset = self._get_base_queryset()
+        if self.optimize_related:
+            queryset = optimize_queryset(queryset, self.fields)
+        return await aget_object_or_404(queryset, pk=pk)
+
+    async def get(self, request, pk):
+        with profile_phase("object"):
+            self.instance = await self.aget_object(pk=pk)
+        return TemplateResponse(request, self.template_name, self.get_context_data())
+
+
+class AsyncBackOfficeCreateView(AsyncBackOfficeViewMixin, BackOfficeCreateView):
+    """Async version of BackOfficeCreateView. The forms are sync, so the handlers
+    are run in a thread."""
+
+
+class AsyncBackOfficeEditView(AsyncBackOfficeViewMixin, BackOfficeEditView):
+    """Async version of BackOfficeEditView. The forms are sync, so the handlers
+    are run in a thread."""
+
+
+class AsyncBackOfficeIndexView(AsyncBackOfficeViewMixin, BackOfficeIndexView):
+    """Async version of BackOfficeIndexView. The groups of statistics are awaited
+    at the same time, as the series of the rollups.
+    """
+
+    async def aget_context_data(self) -> Dict:
+        """Overwrite to add context to the view, using the async ORM."""
+        return self.get_context_data()
+
+    async def aget_statistics(self) -> Dict:
+        return await aget_statistics(self.statistics)
+
+    async def aget_series(self) -> Dict:
+        since = self.get_series_since()
+        series = await asyncio.gather(
+            *(
+                rollup.aget_series(self.rollup_period, since=since)
+                for rollup in self.rollups.values()
+            )
+        )
+        return dict(zip(self.rollups, series))
+
+    async def get(self, request, **kwargs):
+        if not request.user.is_authenticated:
+            return redirect(self.get_sign_in_redirect())
+        context = await self.aget_context_data()
+        if self.statistics and "statistics" not in context:
+            context["statistics"] = await self.aget_statistics()
+        if self.rollups and "series" not in context:
+            context["series"] = await self.aget_series()
+        context.update(self.get_extra_context())
+        return TemplateResponse(request, self.template_name, context)
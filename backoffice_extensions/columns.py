@@ -0,0 +1,178 @@
+import collections
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Type
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.signals import setting_changed
+from django.db import models
+from django.utils.safestring import mark_safe
+
+from backoffice_extensions import settings as backoffice_settings
+from backoffice_extensions.queries import get_field_name, get_relation, is_to_many
+from backoffice_extensions.settings import BackOfficeSettings
+from backoffice_extensions.templatetags.backoffice import (
+    boolean_icon,
+    details_link,
+    parse_value,
+    status_tag,
+)
+
+# Fields which values are shown as they are, so they don't need to be parsed
+PLAIN_FIELDS = (
+    models.CharField,
+    models.TextField,
+    models.IntegerField,
+    models.FloatField,
+    models.DateField,
+    models.TimeField,
+    models.DurationField,
+    models.UUIDField,
+    models.GenericIPAddressField,
+    models.ForeignKey,
+)
+
+Column = collections.namedtuple("Column", ["name", "field", "render"])
+
+# Compiled columns by site, model label and field. The keys are bounded by the
+# fields declared in the views, and they are discarded when the settings change.
+_columns: Dict[Tuple[str, str, Any], Column] = {}
+
+
+def _plain_renderer(name: str) -> Callable:
+    def render(obj):
+        value = getattr(obj, name)
+        return "-" if value is None else value
+
+    return render
+
+
+def _boolean_renderer(name: str) -> Callable:
+    def render(obj):
+        value = getattr(obj, name)
+        return "-" if value is None else boolean_icon(value)
+
+    return render
+
+
+def _decimal_renderer(name: str) -> Callable:
+    def render(obj):
+        value = getattr(obj, name)
+        if value is None:
+            return "-"
+        if value == value.to_integral():
+            return value.quantize(Decimal(1))
+        return value.normalize()
+
+    return render
+
+
+def _image_renderer(name: str) -> Callable:
+    def render(obj):
+        value = getattr(obj, name)
+        if not value:
+            return backoffice_settings.get_settings().NO_IMAGE_VALUE
+        return mark_safe(f'<img class="max-w-xs rounded" src="{value.url}" />')
+
+    return render
+
+
+def _manager_renderer(name: str) -> Callable:
+    def render(obj):
+        items = list(getattr(obj, name).all())
+        if not items:
+            return backoffice_settings.get_settings().NONE_VALUE
+        tags = "".join(f"<li>{str(item)}</li>" for item in items)
+        return mark_safe(f"<ul class='list-disc'>{tags}</ul>")
+
+    return render
+
+
+def _link_renderer(name: str, rules: Tuple) -> Callable:
+    def render(obj):
+        result = getattr(obj, name)
+        if result is None:
+            result = "-"
+        for follow, lookup_field in rules:
+            result = details_link(obj, result, follow, lookup_field)
+        if callable(result) and not isinstance(result, models.Manager):
+            result = result()
+        return parse_value(result)
+
+    return render
+
+
+def _default_renderer(name: str) -> Callable:
+    def render(obj):
+        result = getattr(obj, name)
+        if result is None:
+            result = "-"
+        if callable(result) and not isinstance(result, models.Manager):
+            result = result()
+        return parse_value(result)
+
+    return render
+
+
+def _get_renderer(
+    model: Type[models.Model], name: str, site_settings: BackOfficeSettings
+) -> Callable:
+    """Gets the most specific renderer for the given field, following the same
+    rules as the getattr filter.
+    """
+    if name in site_settings.STATUS_FIELDS:
+        return status_tag
+    rules = site_settings.details_urls_index.get(name)
+    if rules:
+        return _link_renderer(name, rules)
+    relation = get_relation(model, name)
+    if relation is not None and is_to_many(relation):
+        return _manager_renderer(name)
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return _default_renderer(name)
+    if isinstance(field, models.BooleanField):
+        return _boolean_renderer(name)
+    if isinstance(field, models.DecimalField):
+        return _decimal_renderer(name)
+    if isinstance(field, models.ImageField):
+        return _image_renderer(name)
+    if isinstance(field, PLAIN_FIELDS):
+        return _plain_renderer(name)
+    return _default_renderer(name)
+
+
+def compile_column(
+    model: Type[models.Model],
+    field: Any,
+    site_settings: Optional[BackOfficeSettings] = None,
+) -> Column:
+    """Resolves the field, as declared in list_display or fields, into a column
+    with a specialized renderer. The result is cached per site, model and field,
+    so the resolution is done only the first time each view is used.
+    """
+    if site_settings is None:
+        site_settings = backoffice_settings.get_settings()
+    key = (site_settings.site, model._meta.label, field)
+    column = _columns.get(key)
+    if column is None:
+        name = get_field_name(field)
+        column = Column(name, field, _get_renderer(model, name, site_settings))
+        _columns[key] = column
+    return column
+
+
+def compile_columns(model: Type[models.Model], fields: Iterable) -> Tuple[Column, ...]:
+    """Compiles all the given fields of the model."""
+    site_settings = backoffice_settings.get_settings()
+    return tuple(compile_column(model, field, site_settings) for field in fields)
+
+
+def clear_columns(setting: str, **kwargs):
+    """Discards the compiled columns when the backoffice settings change, as they
+    depend on them. Used as setting_changed receiver."""
+    if setting in ("BACKOFFICE", "BACKOFFICE_SITE"):
+        _columns.clear()
+
+
+setting_changed.connect(clear_columns, dispatch_uid="backoffice_columns")
@@ -0,0 +1,290 @@
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.signals import setting_changed
+from django.db import connections
+from django.http import HttpRequest, QueryDict
+from django.utils.module_loading import import_string
+
+from backoffice_extensions import settings as backoffice_settings
+
+if TYPE_CHECKING:
+    from backoffice_extensions.mixins import CSVExportMixin
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+class SyncExecutor(Executor):
+    """Executor that runs the jobs in the calling thread, useful for the tests and
+    for debugging."""
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+def get_executor() -> Executor:
+    """Gets the executor of the export jobs, created the first time from the
+    EXPORT_EXECUTOR setting: "thread", "process", "sync" or the dotted path of an
+    Executor class, that is created with max_workers.
+
+    The state of the jobs is kept in the default cache, so the workers of other
+    processes need a cache shared between processes, like Redis or Memcached.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            site_settings = backoffice_settings.get_settings()
+            kind = site_settings.EXPORT_EXECUTOR
+            max_workers = site_settings.EXPORT_MAX_WORKERS
+            if kind == "process" and isinstance(
+                caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache)
+            ):
+                raise ImproperlyConfigured(
+                    "The process EXPORT_EXECUTOR needs a default cache shared "
+                    "between processes."
+                )
+            if kind == "sync":
+                _executor = SyncExecutor()
+            elif kind == "thread":
+                _executor = ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix="backoffice"
+                )
+            elif kind == "process":
+                _executor = ProcessPoolExecutor(
+                    max_workers=max_workers, initializer=django.setup
+                )
+            else:
+                _executor = import_string(kind)(max_workers=max_workers)
+        return _executor
+
+
+def reset_executor(setting: str, **kwargs):
+    """Discards the executor when the backoffice settings change, so the next job
+    uses the new ones. The running jobs are not cancelled. Used as setting_changed
+    receiver."""
+    global _executor
+    if setting in ("BACKOFFICE", "BACKOFFICE_SITE"):
+        with _executor_lock:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = None
+
+
+setting_changed.connect(reset_executor, dispatch_uid="backoffice_exports")
+
+
+def _get_job_cache_key(job_id: str) -> str:
+    return f"backoffice:export:{job_id}"
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    """Gets the state of the job, or None if it doesn't exist or has expired."""
+    return cache.get(_get_job_cache_key(job_id))
+
+
+def save_job(job: Dict):
+    cache.set(
+        _get_job_cache_key(job["id"]),
+        job,
+        backoffice_settings.get_settings().EXPORT_EXPIRATION,
+    )
+
+
+def new_job(user_pk: Any, filename: str) -> Dict:
+    """Creates the pending job of the user, that writes the file with the given
+    name."""
+    job = {
+        "id": uuid.uuid4().hex,
+        "user": user_pk,
+        "status": PENDING,
+        "rows": 0,
+        "total": None,
+        "started_at": None,
+        "finished_at": None,
+        "filename": filename,
+        "path": None,
+        "error": None,
+    }
+    save_job(job)
+    return job
+
+
+def save_job_file(job: Dict, stream: IO[bytes]) -> str:
+    """Saves the file of the job in the default storage, returning its path."""
+    directory = backoffice_settings.get_settings().EXPORT_DIRECTORY
+    name = f"{directory}/{job['id']}/{job['filename']}"
+    return default_storage.save(name, File(stream))
+
+
+def get_progress(job: Dict) -> Dict:
+    """Gets the public data of the job, with the estimated seconds left."""
+    eta = None
+    if job["status"] == RUNNING and job["rows"] and job["total"]:
+        elapsed = time.time() - job["started_at"]
+        eta = round(elapsed / job["rows"] * (job["total"] - job["rows"]))
+    elif job["status"] == DONE:
+        eta = 0
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "rows": job["rows"],
+        "total": job["total"],
+        "eta": eta,
+        "error": job["error"],
+    }
+
+
+def _run_in_worker(fn: Callable, *args):
+    """Runs the job closing the database connections opened by the worker."""
+    try:
+        return fn(*args)
+    finally:
+        connections.close_all()
+
+
+def start_export(view: "CSVExportMixin", request: "HttpRequest") -> Dict:
+    """Creates the job of the export view and sends it to the executor, returning
+    its current state. The worker builds again the view with the query string,
+    user and URL arguments of the request, in the active site, so the view class
+    should be importable.
+    """
+    view_class = view.__class__
+    job = new_job(request.user.pk, view.get_filename())
+    args = (
+        job["id"],
+        f"{view_class.__module__}.{view_class.__qualname__}",
+        request.GET.urlencode(),
+        request.user.pk,
+        tuple(getattr(view, "args", ())),
+        dict(getattr(view, "kwargs", {})),
+        backoffice_settings.get_site(),
+    )
+    executor = get_executor()
+    if isinstance(executor, SyncExecutor):
+        executor.submit(run_export_job, *args)
+    else:
+        executor.submit(_run_in_worker, run_export_job, *args)
+    return get_job(job["id"]) or job
+
+
+def _count_rows(job: Dict, rows: Iterator[List], every: int) -> Iterator[List]:
+    """Yields the rows updating the progress of the job each every rows."""
+    for row in rows:
+        yield row
+        job["rows"] += 1
+        if job["rows"] % every == 0:
+            save_job(job)
+
+
+def run_export_job(
+    job_id: str,
+    view_path: str,
+    query_string: str,
+    user_pk: Any,
+    url_args: Tuple = (),
+    url_kwargs: Optional[Dict] = None,
+    site: Optional[str] = None,
+):
+    """Writes the export to a temporary file and then saves it in the default
+    storage, so the whole data is never kept in memory. It runs in the site the
+    export was started from.
+    """
+    job = get_job(job_id)
+    if job is None:
+        return
+    job.update(status=RUNNING, started_at=time.time())
+    save_job(job)
+    try:
+        with backoffice_settings.override(site or backoffice_settings.get_site()):
+            _write_export(job, view_path, query_string, user_pk, url_args, url_kwargs)
+    except Exception as error:
+        job.update(status=FAILED, error=str(error), finished_at=time.time())
+        save_job(job)
+        raise
+    job.update(status=DONE, finished_at=time.time())
+    save_job(job)
+
+
+def _write_export(
+    job: Dict,
+    view_path: str,
+    query_string: str,
+    user_pk: Any,
+    url_args: Tuple,
+    url_kwargs: Optional[Dict],
+):
+    """Builds the view again and writes its export in the file of the job."""
+    request = HttpRequest()
+    request.method = "GET"
+    request.GET = QueryDict(query_string)
+    request.user = get_user_model()._default_manager.get(pk=user_pk)
+    view = import_string(view_path)()
+    view.setup(request, *url_args, **(url_kwargs or {}))
+    export_format = view.get_export_format()
+    items = view.get_items(request)
+    fields = view.get_fields()
+    job["total"] = items.count()
+    save_job(job)
+    rows = _count_rows(job, view.iter_rows(items, fields), view.chunk_size)
+    with tempfile.TemporaryFile() as stream:
+        export_format.write(fields, rows, stream)
+        stream.seek(0)
+        job["path"] = save_job_file(job, stream)
+
+
+def clear_expired_exports(expiration: Optional[int] = None) -> int:
+    """Deletes the export files older than expiration seconds (the
+    EXPORT_EXPIRATION setting by default), returning the number of deleted files.
+    """
+    site_settings = backoffice_settings.get_settings()
+    if expiration is None:
+        expiration = site_settings.EXPORT_EXPIRATION
+    root = site_settings.EXPORT_DIRECTORY
+    limit = time.time() - expiration
+    total = 0
+    if not default_storage.exists(root):
+        return total
+    directories, _ = default_storage.listdir(root)
+    for directory in directories:
+        _, files = default_storage.listdir(f"{root}/{directory}")
+        for filename in files:
+            name = f"{root}/{directory}/{filename}"
+            if default_storage.get_modified_time(name).timestamp() < limit:
+                default_storage.delete(name)
+                total += 1
+        if not any(default_storage.listdir(f"{root}/{directory}")):
+            default_storage.delete(f"{root}/{directory}")
+    return total
@@ -0,0 +1,266 @@
+import csv
+import datetime
+import io
+import json
+import os
+from decimal import Decimal
+from itertools import zip_longest
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Type
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from backoffice_extensions.helpers import chunked, stream_csv_from_rows
+
+try:
+    from openpyxl import Workbook, load_workbook
+except ImportError:
+    Workbook = load_workbook = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Types that the columnar formats can store as they are
+NATIVE_TYPES = (
+    str,
+    bool,
+    int,
+    float,
+    Decimal,
+    datetime.date,
+    datetime.time,
+    datetime.timedelta,
+    type(None),
+)
+
+FORMATS: Dict[str, Type["ExportFormat"]] = {}
+
+
+def register_format(format_class: Type["ExportFormat"]) -> Type["ExportFormat"]:
+    """Registers the format under its name, so it can be selected in the export
+    views. Can be used as a decorator.
+    """
+    FORMATS[format_class.name] = format_class
+    return format_class
+
+
+def get_format(name: str) -> Optional["ExportFormat"]:
+    """Gets an instance of the format with the given name, or None if it's not
+    registered or its dependencies are not installed."""
+    format_class = FORMATS.get(name)
+    if format_class is None or not format_class.is_available():
+        return None
+    return format_class()
+
+
+def get_format_for_file(filename: str) -> Optional["ExportFormat"]:
+    """Gets an instance of the format of the file, by its extension."""
+    extension = os.path.splitext(filename)[1].lstrip(".").lower()
+    name = next(
+        (
+            name
+            for name, format_class in FORMATS.items()
+            if format_class.extension == extension
+        ),
+        None,
+    )
+    return get_format(name) if name else None
+
+
+def _native_value(value: Any) -> Any:
+    return value if isinstance(value, NATIVE_TYPES) else str(value)
+
+
+class ExportFormat:
+    """Serializer of the rows of an export. Streaming formats implement stream,
+    that yields the file in pieces, and the rest implement write, that writes the
+    whole file in a binary file object. The formats that can be imported also
+    implement read, that yields the rows of a file as dicts.
+    """
+
+    name: str = ""
+    extension: str = ""
+    content_type: str = "application/octet-stream"
+    streaming: bool = False
+    batch_size: int = 1000
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Checks if the dependencies of the format are installed."""
+        return True
+
+    def stream(self, fields: List, rows: Iterable[List]) -> Iterator[str]:
+        raise NotImplementedError(f"{self.__class__.__name__} can't be streamed.")
+
+    def write(self, fields: List, rows: Iterable[List], file: IO[bytes]):
+        for chunk in self.stream(fields, rows):
+            file.write(chunk.encode())
+
+    def read(self, file: IO[bytes]) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError(f"{self.__class__.__name__} can't be read.")
+
+
+@register_format
+class CSVFormat(ExportFormat):
+    name = "csv"
+    extension = "csv"
+    content_type = "text/csv"
+    streaming = True
+
+    def stream(self, fields: List, rows: Iterable[List]) -> Iterator[str]:
+        return stream_csv_from_rows(fields, rows)
+
+    def read(self, file: IO[bytes]) -> Iterator[Dict[str, Any]]:
+        stream = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")  # type: ignore
+        try:
+            yield from csv.DictReader(stream)
+        finally:
+            stream.detach()
+
+
+@register_format
+class JSONLinesFormat(ExportFormat):
+    """A JSON object per row, with the fields as keys."""
+
+    name = "jsonl"
+    extension = "jsonl"
+    content_type = "application/jsonl"
+    streaming = True
+
+    def stream(self, fields: List, rows: Iterable[List]) -> Iterator[str]:
+        encoder = DjangoJSONEncoder()
+        for batch in chunked(rows, self.batch_size):
+            yield "".join(
+                f"{encoder.encode(dict(zip(fields, row)))}\n" for row in batch
+            )
+
+    def read(self, file: IO[bytes]) -> Iterator[Dict[str, Any]]:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+@register_format
+class XLSXFormat(ExportFormat):
+    """Excel file written with the write-only mode of openpyxl, that keeps the
+    memory constant no matter the number of rows."""
+
+    name = "xlsx"
+    extension = "xlsx"
+    content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return Workbook is not None
+
+    @staticmethod
+    def _convert(value: Any) -> Any:
+        # Excel doesn't support time zones
+        if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+            return timezone.make_naive(value)
+        return _native_value(value)
+
+    def write(self, fields: List, rows: Iterable[List], file: IO[bytes]):
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(fields)
+        for row in rows:
+            sheet.append([self._convert(value) for value in row])
+        workbook.save(file)
+
+    def read(self, file: IO[bytes]) -> Iterator[Dict[str, Any]]:
+        """Reads the first sheet in read-only mode, with the first row as header."""
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = [str(name) for name in next(rows, ())]
+            for row in rows:
+                # The trailing empty cells aren't read
+                yield dict(zip_longest(header, row[: len(header)]))
+        finally:
+            workbook.close()
+
+
+@register_format
+class ParquetFormat(ExportFormat):
+    """Parquet file written with pyarrow, a row group per batch of rows. The
+    schema is inferred from the first batches: while some column only has empty
+    values the batches are kept, up to schema_batches, and the columns that are
+    still empty after them, or that mix values of different types, are written
+    as strings. The values of the next batches should have the types of the
+    schema, otherwise a ValueError is raised."""
+
+    name = "parquet"
+    extension = "parquet"
+    content_type = "application/vnd.apache.parquet"
+    schema_batches: int = 10
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return pyarrow is not None
+
+    @staticmethod
+    def _get_type(values: List, current: Any) -> Any:
+        """Gets the type of a column with the values and the current type, or
+        string if they can't be stored together."""
+        try:
+            return pyarrow.array(values, type=current).type
+        except pyarrow.ArrowException:
+            return pyarrow.string()
+
+    @staticmethod
+    def _get_table(columns: Dict[str, List], schema: Any) -> Any:
+        for field in schema:
+            if pyarrow.types.is_string(field.type):
+                columns[field.name] = [
+                    value if value is None or isinstance(value, str) else str(value)
+                    for value in columns[field.name]
+                ]
+        try:
+            return pyarrow.table(columns, schema=schema)
+        except pyarrow.ArrowException as error:
+            raise ValueError(
+                f"The values don't match the types of the first rows: {error}"
+            ) from error
+
+    def _open_writer(
+        self, file: IO[bytes], fields: List, types: Dict, pending: List[Dict]
+    ) -> Any:
+        schema = pyarrow.schema(
+            [(str(field), types.get(str(field), pyarrow.string())) for field in fields]
+        )
+        writer = pyarrow.parquet.ParquetWriter(file, schema)
+        for columns in pending:
+            writer.write_table(self._get_table(columns, schema))
+        return writer
+
+    def write(self, fields: List, rows: Iterable[List], file: IO[bytes]):
+        writer = None
+        types: Dict[str, Any] = {}
+        pending: List[Dict[str, List]] = []
+        for batch in chunked(rows, self.batch_size):
+            columns = {
+                str(field): [_native_value(row[index]) for row in batch]
+                for index, field in enumerate(fields)
+            }
+            if writer is not None:
+                writer.write_table(self._get_table(columns, writer.schema))
+                continue
+            for name, values in columns.items():
+                type_ = self._get_type(values, types.get(name))
+                if not pyarrow.types.is_null(type_):
+                    types[name] = type_
+            pending.append(columns)
+            if len(types) == len(fields) or len(pending) >= self.schema_batches:
+                writer = self._open_writer(file, fields, types, pending)
+        if writer is None:
+            writer = self._open_writer(file, fields, types, pending)
+        writer.close()
+
+    def read(self, file: IO[bytes]) -> Iterator[Dict[str, Any]]:
+        parquet_file = pyarrow.parquet.ParquetFile(file)
+        for batch in parquet_file.iter_batches(batch_size=self.batch_size):
+            yield from batch.to_pylist()
@@ -0,0 +1,13 @@
+from django import forms
+from django.utils.translation import gettext_lazy as _
+
+
+class ImportFileForm(forms.Form):
+    """Upload of the file of an import."""
+
+    file = forms.FileField(label=_("File"))
+    dry_run = forms.BooleanField(
+        label=_("Dry run"),
+        required=False,
+        help_text=_("Only validate the rows, without importing them."),
+    )
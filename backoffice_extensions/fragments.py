@@ -0,0 +1,119 @@
+import hashlib
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Set, Type
+
+from django.core.cache import cache
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone, translation
+
+from backoffice_extensions import settings as backoffice_settings
+
+_connected_models: Set[Type[models.Model]] = set()
+
+
+def get_row_cache_key(model: Type[models.Model], pk: Any) -> str:
+    return f"backoffice:row:{model._meta.label_lower}:{pk}"
+
+
+def get_rows_signature(columns: Sequence, view: str = "") -> str:
+    """Identifies the way the rows are rendered: the site, the view, the columns
+    and the language and time zone of the request."""
+    site_settings = backoffice_settings.get_settings()
+    signature = (
+        f"{site_settings.site}:{site_settings.URL_NAMESPACE}:{view}:"
+        f"{[column.name for column in columns]!r}:"
+        f"{translation.get_language()}:{timezone.get_current_timezone_name()}"
+    )
+    return hashlib.md5(signature.encode()).hexdigest()
+
+
+def get_row_values(obj: models.Model, columns: Sequence) -> str:
+    """Identifies the values shown in the row: the fields and annotations of the
+    columns. Related managers and methods are left out, as reading them can need
+    queries."""
+    values = []
+    for column in columns:
+        value = getattr(obj, column.name, None)
+        values.append(None if callable(value) else value)
+    return hashlib.md5(repr(values).encode()).hexdigest()
+
+
+def invalidate_row(sender: Type[models.Model], instance: models.Model, **kwargs):
+    """Removes the cached rows of the instance. Used as signal receiver."""
+    cache.delete(get_row_cache_key(sender, instance.pk))
+
+
+def invalidate_rows(queryset: models.QuerySet):
+    """Removes the cached rows of the objects of the queryset, for the changes that
+    don't send signals, like updates."""
+    model = queryset.model
+    pks = queryset.values_list("pk", flat=True)
+    cache.delete_many([get_row_cache_key(model, pk) for pk in pks])
+
+
+def connect_row_signals(model: Type[models.Model]):
+    """Connects the signals that invalidate the cached rows of the model, once per
+    model."""
+    if model in _connected_models:
+        return
+    for signal in (post_save, post_delete):
+        signal.connect(
+            invalidate_row,
+            sender=model,
+            dispatch_uid=f"backoffice_rows_{model._meta.label}",
+        )
+    _connected_models.add(model)
+
+
+def get_rows_timeout(version_field: Optional[str]) -> Optional[int]:
+    """Gets the timeout of the cached rows. Without version_field the changes made
+    by other processes to the values not shown are only noticed when the rows
+    expire, so ROW_CACHE_UNVERSIONED_TIMEOUT is used if it's shorter."""
+    site_settings = backoffice_settings.get_settings()
+    timeout = site_settings.ROW_CACHE_TIMEOUT
+    unversioned_timeout = site_settings.ROW_CACHE_UNVERSIONED_TIMEOUT
+    if version_field is None and unversioned_timeout is not None:
+        if timeout is None or unversioned_timeout < timeout:
+            return unversioned_timeout
+    return timeout
+
+
+def get_cached_rows(
+    objects: Iterable[models.Model],
+    columns: Sequence,
+    render: Callable[[models.Model], str],
+    version_field: Optional[str] = None,
+    view: str = "",
+) -> Dict[Any, str]:
+    """Gets the rendered rows of the objects by pk, reading all of them from the
+    cache at once and rendering only the missing ones. Each object has an entry
+    with its version, made of the version_field and the values shown, and the
+    rows rendered with each signature, so a new version discards the rows of the
+    previous one. Nothing is cached if the timeout is 0.
+    """
+    objects = list(objects)
+    timeout = get_rows_timeout(version_field)
+    if not objects or timeout == 0:
+        return {}
+    model = objects[0].__class__
+    signature = get_rows_signature(columns, view)
+    keys = {obj.pk: get_row_cache_key(model, obj.pk) for obj in objects}
+    cached = cache.get_many(list(keys.values()))
+    rows, updated = {}, {}
+    for obj in objects:
+        version = (
+            getattr(obj, version_field) if version_field else None,
+            get_row_values(obj, columns),
+        )
+        entry = cached.get(keys[obj.pk])
+        if entry is None or entry["version"] != version:
+            entry = {"version": version, "rows": {}}
+        html = entry["rows"].get(signature)
+        if html is None:
+            html = render(obj)
+            entry["rows"][signature] = html
+            updated[keys[obj.pk]] = entry
+        rows[obj.pk] = html
+    if updated:
+        cache.set_many(updated, timeout)
+    return rows
@@ -2,7 +2,7 @@ import collections
 import csv
 import datetime
 import io
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
 from django.utils import timezone
 
@@ -23,6 +23,46 @@ def create_csv_from_data(
     return stream
 
 
+class _Echo:
+    """File-like object that returns the written value instead of storing it, so
+    the csv writer can be used to build lines on demand.
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def stream_csv_from_rows(
+    header: List, rows: Iterable[Iterable], buffer_size: int = 100
+) -> Iterator[str]:
+    """Generator version of create_csv_from_data. Yields the header straight away
+    and then the rows as they are produced, grouped in blocks of buffer_size lines,
+    so the whole data never needs to be kept in memory.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow(row))
+        if len(buffer) >= buffer_size:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    """Groups the items of the iterable in lists of size items."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
 def age_range_filter(
     field: Any, min_age: Optional[int] = None, max_age: Optional[int] = None
 ) -> Dict:
@@ -41,6 +81,6 @@ def age_range_filter(
 
 
 StatisticsValue = collections.namedtuple(
-    "StatisticsValue", ["value", "percentage", "help_text"]
+    "StatisticsValue", ["value", "percentage", "help_text", "computed_at"]
 )
-StatisticsValue.__new__.__defaults__ = (False, None)  # type: ignore
+StatisticsValue.__new__.__defaults__ = (False, None, None)  # type: ignore
@@ -0,0 +1,169 @@
+import collections
+import csv
+import functools
+import io
+import operator
+import tempfile
+import time
+from typing import IO, Any, Dict, List, Optional, Tuple, Type
+
+import django
+from django import forms
+from django.db import connections, models
+
+from backoffice_extensions.exports import DONE, new_job, save_job, save_job_file
+
+# The result of an import: the number of rows read, imported and with errors, the
+# first errors as (row, message) tuples and the job of the error report, if any
+ImportResult = collections.namedtuple(
+    "ImportResult", ["rows", "imported", "errors", "preview", "report"]
+)
+
+
+# A valid row of an import: its number, its data, the unsaved instance and the
+# cleaned data of the form
+ImportRow = collections.namedtuple(
+    "ImportRow", ["row", "data", "instance", "cleaned_data"]
+)
+
+
+# The Django versions whose forms are known to be validated right when their
+# data and instance are replaced, as RowValidator does
+REUSABLE_FORMS_VERSIONS = ((3, 2), (5, 2))
+
+
+class RowValidator:
+    """Validates the rows as form_class(data=row).is_valid() does. With the
+    REUSABLE_FORMS_VERSIONS of Django, a single bound form is validated again for
+    each row, so its fields are not copied every time. With the rest, a new form
+    is built for each row.
+    """
+
+    def __init__(self, form_class: Type[forms.ModelForm]):
+        self.form_class = form_class
+        self.form: Optional[forms.ModelForm] = None
+        first, last = REUSABLE_FORMS_VERSIONS
+        if first <= django.VERSION[:2] <= last:
+            self.form = form_class(data={})
+
+    def validate(self, data: Dict[str, Any]) -> forms.ModelForm:
+        """Gets the form validated with the data. The reused form is overwritten by
+        the next row, so its instance and cleaned_data should be kept before."""
+        form = self.form
+        if form is None:
+            form = self.form_class(data=data)
+        else:
+            form.data = data
+            form.instance = form._meta.model()
+        form.full_clean()
+        return form
+
+
+def insert_objects(model: Type[models.Model], objs: List, using: str) -> bool:
+    """Inserts the objects with an INSERT prepared once and executed for all of
+    them, instead of compiling a query with the values of all the objects, as
+    bulk_create does. Returns False, inserting nothing, for the models that need
+    bulk_create: with parents, fields with custom placeholders or values for the
+    auto primary key. The pks of the objects are not set.
+    """
+    options = model._meta
+    fields = [
+        field
+        for field in options.concrete_fields
+        if not isinstance(field, models.AutoField)
+    ]
+    if (
+        options.parents
+        or any(hasattr(field, "get_placeholder") for field in fields)
+        or (
+            isinstance(options.pk, models.AutoField)
+            and any(obj.pk is not None for obj in objs)
+        )
+    ):
+        return False
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        quote_name(options.db_table),
+        ", ".join(quote_name(field.column) for field in fields),
+        ", ".join(["%s"] * len(fields)),
+    )
+    # The fields that don't change the value before saving it are read directly
+    prepare = [
+        (
+            operator.attrgetter(field.attname)
+            if type(field).pre_save is models.Field.pre_save
+            else functools.partial(field.pre_save, add=True),
+            field.get_db_prep_save,
+        )
+        for field in fields
+    ]
+    params = [
+        [
+            get_db_prep_save(get_value(obj), connection)
+            for get_value, get_db_prep_save in prepare
+        ]
+        for obj in objs
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+    return True
+
+
+def format_errors(errors: Dict[str, List[str]]) -> str:
+    """Formats the errors of a form in a line."""
+    return "; ".join(
+        " ".join(messages) if field == "__all__" else f"{field}: {' '.join(messages)}"
+        for field, messages in errors.items()
+    )
+
+
+class ErrorReport:
+    """CSV file with the rows that couldn't be imported, with their number and
+    errors. The rows are written to a temporary file as they are found, and only
+    the first preview_size errors are kept in memory, to be shown.
+    """
+
+    def __init__(self, preview_size: int = 10):
+        self.preview_size = preview_size
+        self.count = 0
+        self.preview: List[Tuple[int, str]] = []
+        self._file: Optional[io.TextIOWrapper] = None
+        self._buffer: Optional[IO[bytes]] = None
+        self._writer: Optional[csv.DictWriter] = None
+
+    def add(self, row: int, data: Dict[str, Any], message: str):
+        if self._writer is None:
+            self._buffer = tempfile.TemporaryFile()
+            self._file = io.TextIOWrapper(self._buffer, encoding="utf-8", newline="")
+            self._writer = csv.DictWriter(
+                self._file, fieldnames=["row", "errors", *data], extrasaction="ignore"
+            )
+            self._writer.writeheader()
+        self._writer.writerow({**data, "row": row, "errors": message})
+        self.count += 1
+        if len(self.preview) < self.preview_size:
+            self.preview.append((row, message))
+
+    def save(self, user_pk: Any, filename: str) -> Optional[Dict]:
+        """Saves the report as a finished export job of the user, so it can be
+        downloaded with the export views. Returns the job, or None if there are no
+        errors."""
+        if self._file is None or self._buffer is None:
+            return None
+        job = new_job(user_pk, filename)
+        self._file.flush()
+        self._buffer.seek(0)
+        job.update(
+            path=save_job_file(job, self._buffer),
+            status=DONE,
+            rows=self.count,
+            total=self.count,
+            finished_at=time.time(),
+        )
+        save_job(job)
+        return job
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from backoffice_extensions import settings as backoffice_settings
+from backoffice_extensions.exports import clear_expired_exports
+
+
+class Command(BaseCommand):
+    help = "Deletes the files of the background exports that have expired."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--expiration",
+            type=int,
+            default=backoffice_settings.get_settings().EXPORT_EXPIRATION,
+            help="Seconds after which an export file is deleted.",
+        )
+
+    def handle(self, *args, **options):
+        total = clear_expired_exports(options["expiration"])
+        self.stdout.write(f"{total} expired export files deleted.")
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from backoffice_extensions.resolvers import get_view_classes
+from backoffice_extensions.views import BackOfficeIndexView
+
+
+class Command(BaseCommand):
+    help = (
+        "Updates the buckets of the rollups of the index views with the rows added "
+        "or changed since the last update."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Recomputes all the buckets instead of the changed ones.",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database in where the rollups are computed and stored.",
+        )
+
+    def handle(self, *args, **options):
+        rollups = {}
+        for view_class in get_view_classes():
+            if issubclass(view_class, BackOfficeIndexView):
+                for rollup in view_class.rollups.values():
+                    rollups.setdefault(rollup.name, rollup)
+        for rollup in rollups.values():
+            total = rollup.update(full=options["full"], using=options["database"])
+            self.stdout.write(f"{rollup.name}: {total} buckets updated.")
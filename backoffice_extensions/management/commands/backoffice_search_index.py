@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from backoffice_extensions.mixins import SearchListMixin
+from backoffice_extensions.resolvers import get_view_classes
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds or refreshes the indexes of the search backends used by the "
+        "views with SearchListMixin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database in where the indexes are built.",
+        )
+
+    def handle(self, *args, **options):
+        backends = {}
+        for view_class in get_view_classes():
+            if not issubclass(view_class, SearchListMixin):
+                continue
+            queryset = getattr(view_class, "queryset", None)
+            model = getattr(queryset, "model", None) or getattr(
+                view_class, "model", None
+            )
+            if model is None:
+                continue
+            backend = view_class.get_search_backend(model)
+            if not backend.supports_index:
+                continue
+            key = (
+                backend.__class__,
+                model,
+                tuple(backend.search_fields),
+                repr(sorted(view_class.search_backend_kwargs.items())),
+            )
+            backends.setdefault(key, backend)
+        for backend in backends.values():
+            total = backend.build_index(using=options["database"])
+            self.stdout.write(
+                f"{backend.__class__.__name__}: {total} rows of "
+                f"{backend.model._meta.label} indexed."
+            )
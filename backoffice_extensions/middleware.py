@@ -0,0 +1,30 @@
+from typing import TYPE_CHECKING, Callable
+
+from backoffice_extensions import settings as backoffice_settings
+
+if TYPE_CHECKING:
+    from django.http import HttpRequest, HttpResponse
+
+
+class BackOfficeSiteMiddleware:
+    """Activates the backoffice site of the requested URL, the one whose
+    URL_NAMESPACE is a namespace of the URL, so several sites can be served by the
+    same project. The BACKOFFICE_SITE setting is used for the rest of the URLs, and
+    for the content of the streaming responses, that is generated after it.
+    """
+
+    def __init__(self, get_response: Callable[["HttpRequest"], "HttpResponse"]):
+        self.get_response = get_response
+
+    def __call__(self, request: "HttpRequest") -> "HttpResponse":
+        try:
+            return self.get_response(request)
+        finally:
+            backoffice_settings.deactivate()
+
+    def process_view(self, request: "HttpRequest", view_func, view_args, view_kwargs):
+        for namespace in request.resolver_match.namespaces:
+            site = backoffice_settings.get_namespace_site(namespace)
+            if site is not None:
+                backoffice_settings.activate(site)
+                break
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:39
+
+from typing import List, Tuple
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies: List[Tuple[str, str]] = []
+
+    operations = [
+        migrations.CreateModel(
+            name="StatisticsBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rollup", models.CharField(max_length=100, verbose_name="rollup")),
+                ("period", models.CharField(max_length=16, verbose_name="period")),
+                ("start", models.DateField(verbose_name="start")),
+                ("value", models.FloatField(null=True, verbose_name="value")),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="updated at"),
+                ),
+            ],
+            options={
+                "verbose_name": "statistics bucket",
+                "verbose_name_plural": "statistics buckets",
+                "ordering": ["rollup", "period", "start"],
+            },
+        ),
+        migrations.CreateModel(
+            name="StatisticsWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "rollup",
+                    models.CharField(
+                        max_length=100, unique=True, verbose_name="rollup"
+                    ),
+                ),
+                (
+                    "watermark",
+                    models.DateTimeField(null=True, verbose_name="watermark"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="updated at"),
+                ),
+            ],
+            options={
+                "verbose_name": "statistics watermark",
+                "verbose_name_plural": "statistics watermarks",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="statisticsbucket",
+            constraint=models.UniqueConstraint(
+                fields=("rollup", "period", "start"),
+                name="backoffice_unique_statistics_bucket",
+            ),
+        ),
+    ]
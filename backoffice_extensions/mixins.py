@@ -1,72 +1,278 @@
+import asyncio
 import collections
-from functools import reduce
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+import datetime
+import hashlib
+import inspect
+import os
+import tempfile
+from itertools import chain
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple, Type
 
-from django.db import models
-from django.db.models import Q
-from django.http import HttpResponse
-from django.urls import NoReverseMatch, reverse
+from asgiref.sync import sync_to_async
+from django import forms
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.messages import get_messages
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connections, models, router, transaction
+from django.db.models import Q, prefetch_related_objects
+from django.db.models.constants import LOOKUP_SEP
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.middleware.csrf import get_token
+from django.urls import reverse
+from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.functional import classproperty
+from django.utils.http import http_date
+from django.utils.translation import gettext as _
 
-from backoffice_extensions.helpers import create_csv_from_data
-from backoffice_extensions.settings import LOGO, TITLE, URL_NAMESPACE
+from backoffice_extensions import settings as backoffice_settings
+from backoffice_extensions.exports import get_progress, start_export
+from backoffice_extensions.formats import (
+    ExportFormat,
+    get_format,
+    get_format_for_file,
+)
+from backoffice_extensions.helpers import (
+    chunked,
+    create_csv_from_data,
+    stream_csv_from_rows,
+)
+from backoffice_extensions.imports import (
+    ErrorReport,
+    ImportResult,
+    ImportRow,
+    RowValidator,
+    format_errors,
+    insert_objects,
+)
+from backoffice_extensions.profiling import (
+    add_server_timing,
+    aprofile_request,
+    profile_phase,
+    profile_request,
+)
+from backoffice_extensions.queries import (
+    get_field_name,
+    get_related_lookups,
+    get_version_field,
+    is_column_path,
+    optimize_queryset,
+)
+from backoffice_extensions.resolvers import reverse_or_empty
+from backoffice_extensions.search import IContainsSearchBackend, SearchBackend
+from backoffice_extensions.sidebar import get_permissions_generation, get_user_cache_key
 
 if TYPE_CHECKING:
     from django.http import HttpRequest, HttpResponse
+    from django.http.response import HttpResponseBase
+
+
+def _is_profiling(view: Any) -> bool:
+    """Checks the profiling attribute of the view, or the PROFILING setting if it's
+    None."""
+    profiling = getattr(view, "profiling", None)
+    if profiling is None:
+        return backoffice_settings.get_settings().PROFILING
+    return profiling
 
 
 class BackOfficeViewMixin:
+    """Common behaviour of the backoffice views. Set profiling to True (None uses
+    the PROFILING setting) to time the phases of the requests, that are sent in
+    the Server-Timing header and to the PROFILING_METRICS_HOOK.
+    """
+
     uses_template: bool = True
     template_name: Optional[str] = None
+    profiling: Optional[bool] = None
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if not self.template_name and self.uses_template:
             raise NotImplementedError("You should specify the template_name attribute.")
 
+    def dispatch(self, request: "HttpRequest", *args, **kwargs) -> "HttpResponseBase":
+        if not _is_profiling(self):
+            return super().dispatch(request, *args, **kwargs)  # type: ignore
+        with profile_request(self.__class__.__name__) as profile:
+            response = super().dispatch(request, *args, **kwargs)  # type: ignore
+            if hasattr(response, "render") and not response.is_rendered:
+                with profile.phase("render"):
+                    response.render()
+        add_server_timing(response, profile)
+        return response
+
     def get_extra_context(self) -> Dict:
         """Adds default context to the backoffice views. Overwrite to add more
         context to the view.
         """
-        try:
-            index_url = reverse(f"{URL_NAMESPACE}:index")
-        except NoReverseMatch:
-            index_url = ""
-        try:
-            sign_out = reverse(f"{URL_NAMESPACE}:sign-out")
-        except NoReverseMatch:
-            sign_out = ""
-        try:
-            sign_in = reverse(f"{URL_NAMESPACE}:sign-in")
-        except NoReverseMatch:
-            sign_in = ""
+        site_settings = backoffice_settings.get_settings()
+        namespace = site_settings.URL_NAMESPACE
+        index_url = reverse_or_empty(f"{namespace}:index")
+        sign_out = reverse_or_empty(f"{namespace}:sign-out")
+        sign_in = reverse_or_empty(f"{namespace}:sign-in")
         return {
-            "backoffice_title": TITLE,
-            "backoffice_logo": LOGO,
+            "backoffice_title": site_settings.TITLE,
+            "backoffice_logo": site_settings.LOGO,
             "index_url": index_url,
             "sign_out": sign_out,
             "sign_in": sign_in,
         }
 
 
+class ConditionalGetMixin:
+    """Mixin to answer the GET requests with 304 Not Modified, without running the
+    view, when the page didn't change since the client got it.
+
+    Set conditional_get to True to enable it. The views implement get_version, a
+    cheap query whose result changes with the data shown, using the version_field
+    (by default modified or updated_at, if the model has them). The ETag also
+    includes the user, the session, the language and the URL, as the page depends
+    on them. Requests with pending messages always get the full page.
+    """
+
+    conditional_get: bool = False
+    version_field: Optional[str] = None
+
+    def get_version_field(self, model: Type[models.Model]) -> Optional[str]:
+        return self.version_field or get_version_field(model)
+
+    def get_version(self) -> Optional[Tuple[Any, Optional[datetime.datetime]]]:
+        """Gets the version of the data shown and its last modification date, or
+        None if it can't be known. The URL arguments are in self.kwargs."""
+        return None
+
+    def get_etag(self, version: Any) -> str:
+        request = self.request  # type: ignore
+        session = getattr(request, "session", None)
+        # Makes sure the CSRF secret of the forms in the page is already set
+        get_token(request)
+        parts = (
+            version,
+            get_user_cache_key(getattr(request, "user", None)),
+            session.session_key if session is not None else None,
+            request.META.get("CSRF_COOKIE"),
+            get_permissions_generation(),
+            translation.get_language(),
+            request.get_full_path(),
+        )
+        digest = hashlib.md5(repr(parts).encode()).hexdigest()
+        return f'"{digest}"'
+
+    def dispatch(self, request: "HttpRequest", *args, **kwargs) -> "HttpResponseBase":
+        if (
+            not self.conditional_get
+            or request.method not in ("GET", "HEAD")
+            or len(get_messages(request))
+        ):
+            return super().dispatch(request, *args, **kwargs)  # type: ignore
+        with profile_phase("version"):
+            validators = self.get_version()
+        if validators is None:
+            return super().dispatch(request, *args, **kwargs)  # type: ignore
+        version, modified = validators
+        etag = self.get_etag(version)
+        last_modified = int(modified.timestamp()) if modified else None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)  # type: ignore
+            if 200 <= response.status_code < 300:
+                response.setdefault("ETag", etag)
+                if last_modified is not None:
+                    response.setdefault("Last-Modified", http_date(last_modified))
+        # The browsers have to revalidate the page, and only them can store it
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+def _load_user(request: "HttpRequest") -> bool:
+    """Evaluates the lazy user of the request, returning if it's authenticated."""
+    user = getattr(request, "user", None)
+    return user is not None and user.is_authenticated
+
+
+class AsyncBackOfficeViewMixin:
+    """Mixin to make a view async, put it before the rest of the bases. The
+    handlers can be coroutines, that should use the async ORM, or regular
+    methods, that are run in a thread, so the sync mixins can be reused.
+
+    The user of the request is loaded before calling the handlers, so
+    request.user can be used from async code. It checks the login of the views
+    with LoginRequiredMixin and profiles the requests like BackOfficeViewMixin.
+    The dispatch of the rest of the bases is not called.
+    """
+
+    @classproperty
+    def view_is_async(cls) -> bool:
+        return True
+
+    async def dispatch(
+        self, request: "HttpRequest", *args, **kwargs
+    ) -> "HttpResponseBase":
+        is_authenticated = await sync_to_async(_load_user)(request)
+        if isinstance(self, LoginRequiredMixin) and not is_authenticated:
+            return self.handle_no_permission()
+        if not _is_profiling(self):
+            return await self.call_handler(request, *args, **kwargs)
+        async with aprofile_request(self.__class__.__name__) as profile:
+            response = await self.call_handler(request, *args, **kwargs)
+            if hasattr(response, "render") and not response.is_rendered:
+                with profile.phase("render"):
+                    await sync_to_async(response.render)()
+        add_server_timing(response, profile)
+        return response
+
+    async def call_handler(
+        self, request: "HttpRequest", *args, **kwargs
+    ) -> "HttpResponseBase":
+        method = request.method.lower()  # type: ignore
+        handler = self.http_method_not_allowed  # type: ignore
+        if method in self.http_method_names:  # type: ignore
+            handler = getattr(self, method, handler)
+        if asyncio.iscoroutinefunction(handler):
+            return await handler(request, *args, **kwargs)
+        response = await sync_to_async(handler)(request, *args, **kwargs)
+        # The default handlers of async views return coroutines
+        if inspect.isawaitable(response):
+            response = await response
+        return response
+
+
 class SearchListMixin:
     """Mixin to add search functionality to default ListView
-    Django view."""
+    Django view.
+
+    The search is done by the search_backend_class, created with the
+    search_backend_kwargs. By default, it uses icontains lookups.
+    """
 
     search_param: str = "search"
     search_fields: List = []
+    search_backend_class: Type[SearchBackend] = IContainsSearchBackend
+    search_backend_kwargs: Dict = {}
+
+    @classmethod
+    def get_search_backend(cls, model: Type[models.Model]) -> SearchBackend:
+        """Gets the search backend instance for the given model."""
+        return cls.search_backend_class(
+            model, cls.search_fields, **cls.search_backend_kwargs
+        )
 
     def _search_filter(self, queryset) -> "models.QuerySet":
         """Applies search filtering to queryset."""
         search_query = self.request.GET.get(self.search_param)  # type: ignore
         if search_query:
-            queryset_filter = [
-                Q(**{f"{search_field}__icontains": search_query})
-                for search_field in self.search_fields
-            ]
-            if queryset_filter:
-                queryset = queryset.filter(
-                    reduce(lambda x, y: x | y, queryset_filter)
-                ).distinct()
+            backend = self.get_search_backend(queryset.model)
+            queryset = backend.filter(queryset, search_query)
         return queryset
 
     def get_queryset(self) -> "models.QuerySet":
@@ -86,18 +292,58 @@ class SearchListMixin:
 
 
 class CSVExportMixin:
-    """Mixin to allow export CSV data."""
+    """Mixin to allow export CSV data.
+
+    Set streaming to True to send the rows to the client as they are read from the
+    database, instead of building the whole file in memory first. The relations
+    used in fields are loaded with select_related and prefetch_related, set
+    optimize_related to False to disable it.
+
+    Set background to True to write the file in a worker (see the exports module)
+    instead. The view answers with the job progress and the URL to poll it.
+
+    The format is selected with the format_param, among the registered ones (see
+    the formats module) or the given in formats. CSV is used by default.
+
+    When all the fields are database columns, the rows are fetched as tuples with
+    values_list instead of building an instance per row. Set use_values_list to
+    False to always use instances. Otherwise, the instances are processed in
+    chunks of chunk_size, loading the to-many fields of each chunk at once.
+    """
 
     filename: str = "data.csv"
     queryset: "models.QuerySet" = None
     filterset_class = None
     fields: List = []
+    streaming: bool = False
+    chunk_size: int = 2000
+    optimize_related: bool = True
+    background: bool = False
+    export_status_url_name: Optional[str] = None  # <namespace>:export-status
+    format_param: str = "format"
+    default_format: str = "csv"
+    formats: Optional[List[str]] = None
+    use_values_list: bool = True
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if self.queryset is None:
             raise NotImplementedError("You should specify the queryset attribute.")
 
+    def get_background_response(self, request: "HttpRequest") -> "JsonResponse":
+        """Starts the export job and returns its progress."""
+        job = start_export(self, request)
+        url_name = (
+            self.export_status_url_name
+            or f"{backoffice_settings.get_settings().URL_NAMESPACE}:export-status"
+        )
+        status_url = reverse(url_name, kwargs={"job_id": job["id"]})
+        response = JsonResponse(
+            {**get_progress(job), "status_url": status_url}, status=202
+        )
+        response["Location"] = status_url
+        return response
+
     def get_csv_response(self, data: Dict) -> "HttpResponse":
         response = HttpResponse(content_type="text/csv")
         response[
@@ -106,12 +352,80 @@ class CSVExportMixin:
         create_csv_from_data(data, stream=response)
         return response
 
+    def get_streaming_csv_response(
+        self, fields: List, rows: Iterator[List]
+    ) -> "StreamingHttpResponse":
+        response = StreamingHttpResponse(
+            stream_csv_from_rows(fields, rows), content_type="text/csv"
+        )
+        response[
+            "Content-Disposition"
+        ] = f'attachment; filename="{self.get_filename()}"'
+        return response
+
+    def get_export_response(
+        self, export_format: ExportFormat, fields: List, rows: Iterator[List]
+    ) -> "HttpResponseBase":
+        """Streams the formats that allow it, the rest are written to a temporary
+        file that is sent once finished."""
+        if export_format.streaming:
+            response = StreamingHttpResponse(
+                export_format.stream(fields, rows),
+                content_type=export_format.content_type,
+            )
+            response[
+                "Content-Disposition"
+            ] = f'attachment; filename="{self.get_filename()}"'
+            return response
+        file = tempfile.TemporaryFile()
+        export_format.write(fields, rows, file)
+        file.seek(0)
+        return FileResponse(
+            file,
+            as_attachment=True,
+            filename=self.get_filename(),
+            content_type=export_format.content_type,
+        )
+
+    def get_export_format(self) -> ExportFormat:
+        """Gets the format requested in the format_param."""
+        name = self.request.GET.get(self.format_param, self.default_format)  # type: ignore
+        export_format = None
+        if self.formats is None or name in self.formats:
+            export_format = get_format(name)
+        if export_format is None:
+            raise Http404(f"Export format '{name}' not available.")
+        return export_format
+
     def get_filename(self) -> str:
-        return self.filename
+        """Gets the filename, with the extension of the format if it's not the
+        default one."""
+        export_format = self.get_export_format()
+        if export_format.name == self.default_format:
+            return self.filename
+        root, _ = os.path.splitext(self.filename)
+        return f"{root}.{export_format.extension}"
 
     def get_queryset(self) -> "models.QuerySet":
         return self.queryset
 
+    def get_fields(self) -> List:
+        """Gets the name of the exported fields, always including the id."""
+        fields: List = [get_field_name(field) for field in self.fields]
+        if "id" not in fields:
+            fields = ["id"] + fields
+        return fields
+
+    def get_items(self, request: "HttpRequest") -> "models.QuerySet":
+        """Gets the queryset to export, filtered with the filterset_class if any."""
+        items: "models.QuerySet" = self.get_queryset()
+        if self.filterset_class:
+            _filter = self.filterset_class(request.GET, queryset=items, request=request)
+            items = _filter.qs
+        if self.optimize_related:
+            items = optimize_queryset(items, self.get_fields())
+        return items
+
     def _default_convert_value(self, value: Any) -> Any:
         """Default value converter."""
         if isinstance(value, models.Manager):
@@ -128,28 +442,378 @@ class CSVExportMixin:
         """
         return value, False
 
-    def get(self, request: "HttpRequest", *args, **kwargs) -> "HttpResponse":
-        items: "models.QuerySet" = self.get_queryset()
-        if self.filterset_class:
-            _filter = self.filterset_class(request.GET, queryset=items, request=request)
-            items = _filter.qs
-        fields: List = [
-            field[0] if isinstance(field, tuple) else field for field in self.fields
-        ]
-        if "id" not in fields:
-            fields = ["id"] + fields
+    def _convert(self, value: Any) -> Any:
+        value, converted = self.convert_value(value)
+        # If not handled, uses the default value converters
+        if not converted:
+            value = self._default_convert_value(value)
+        return value
+
+    @staticmethod
+    def _get_value(item: Any, field: str) -> Any:
+        """Gets the value of the field, following the relations of the path."""
+        for attribute in field.split(LOOKUP_SEP):
+            if item is None:
+                break
+            item = getattr(item, attribute)
+        return item
+
+    def can_use_values_list(self, items: "models.QuerySet", fields: List) -> bool:
+        """Checks if the rows can be fetched with values_list."""
+        return self.use_values_list and all(
+            is_column_path(items.model, field) for field in fields
+        )
+
+    def iter_rows(self, items: "models.QuerySet", fields: List) -> Iterator[List]:
+        """Yields the converted values of each item, fetching the items from the
+        database in chunks of chunk_size.
+        """
+        if self.can_use_values_list(items, fields):
+            values = items.values_list(*fields).iterator(chunk_size=self.chunk_size)
+            for values_row in values:
+                yield [self._convert(value) for value in values_row]
+            return
+        # The prefetches are done by chunk, with a query per lookup
+        _, to_many = get_related_lookups(items.model, fields)
+        lookups = list(items._prefetch_related_lookups)
+        lookups += [lookup for lookup in to_many if lookup not in lookups]
+        instances = items.prefetch_related(None).iterator(chunk_size=self.chunk_size)
+        for chunk in chunked(instances, self.chunk_size):
+            prefetch_related_objects(chunk, *lookups)
+            for item in chunk:
+                yield [self._convert(self._get_value(item, field)) for field in fields]
+
+    def get(self, request: "HttpRequest", *args, **kwargs) -> "HttpResponseBase":
+        export_format = self.get_export_format()
+        if self.background:
+            return self.get_background_response(request)
+        items = self.get_items(request)
+        fields = self.get_fields()
+        rows = self.iter_rows(items, fields)
+        if export_format.name != "csv":
+            return self.get_export_response(export_format, fields, rows)
+        if self.streaming:
+            return self.get_streaming_csv_response(fields, rows)
         data: collections.OrderedDict = collections.OrderedDict()
         for field in fields:
             data[field] = []
-        for item in items.iterator():
-            for field in fields:
-                value = getattr(item, field)
-                value, converted = self.convert_value(value)
-                # If not handled, uses the default value converters
-                if not converted:
-                    value = self._default_convert_value(value)
+        for row in rows:
+            for field, value in zip(fields, row):
                 data[field].append(value)
         return self.get_csv_response(data=data)
 
 
+class BulkActionMixin:
+    """Mixin for the actions over several rows of a list. The rows are the selected
+    ones, sent in the selection_param, or all the rows filtered as in the list
+    (with the filterset_class and, combined with SearchListMixin, the search) if
+    the select_across_param is sent. The filters are read from the query string.
+    """
+
+    queryset: "models.QuerySet" = None
+    filterset_class = None
+    selection_param: str = "selection"
+    select_across_param: str = "select_across"
+    chunk_size: int = 1000
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.queryset is None:
+            raise NotImplementedError("You should specify the queryset attribute.")
+
+    def get_queryset(self) -> "models.QuerySet":
+        """Uses the FilterSet class to filter the query."""
+        queryset = self.queryset.all()
+        if self.filterset_class:
+            _filter = self.filterset_class(
+                self.request.GET, queryset=queryset, request=self.request  # type: ignore
+            )
+            queryset = _filter.qs
+        return queryset
+
+    def get_selection(self) -> List:
+        """Gets the selected primary keys, ignoring the invalid ones."""
+        pk_field = self.queryset.model._meta.pk
+        selection = []
+        for value in self.request.POST.getlist(self.selection_param):  # type: ignore
+            try:
+                selection.append(pk_field.to_python(value))
+            except ValidationError:
+                continue
+        return selection
+
+    def get_selected_queryset(self) -> "models.QuerySet":
+        """Gets the queryset with the rows the action is applied to."""
+        queryset = self.get_queryset()
+        if self.request.POST.get(self.select_across_param):  # type: ignore
+            return queryset
+        return queryset.filter(pk__in=self.get_selection())
+
+    def get_redirect_response(self) -> HttpResponseRedirect:
+        """Redirects to the list, with the same filters."""
+        model_name = self.queryset.model._meta.model_name
+        namespace = backoffice_settings.get_settings().URL_NAMESPACE
+        url = reverse(f"{namespace}:{model_name}-list")
+        if self.request.GET:  # type: ignore
+            url = f"{url}?{self.request.GET.urlencode()}"  # type: ignore
+        return HttpResponseRedirect(url)
+
+    def iter_chunks(self, queryset: "models.QuerySet") -> Iterator["models.QuerySet"]:
+        """Splits the queryset in querysets of chunk_size rows, paginating by the
+        primary key, so the rows removed or changed by the action in the previous
+        chunks don't shift the next ones.
+        """
+        pks = queryset.order_by("pk").values_list("pk", flat=True)
+        last = None
+        while True:
+            chunk_pks = pks if last is None else pks.filter(pk__gt=last)
+            chunk = list(chunk_pks[: self.chunk_size])
+            if not chunk:
+                break
+            yield self.queryset.model._default_manager.filter(pk__in=chunk)
+            last = chunk[-1]
+
+
+class ImportMixin:
+    """Mixin to import the rows of an uploaded file, the counterpart of
+    CSVExportMixin. The file is read row by row, in any of the registered formats
+    (or the given in formats) that can be read, selected by its extension.
+
+    The rows are validated with the form_class in batches of batch_size rows (see
+    RowValidator), and the valid ones are created in a transaction per batch,
+    with an INSERT prepared once for the whole batch. Set fast_insert to False to
+    use bulk_create of the default manager instead, as it's done for the rows
+    with many to many values. The unique fields are checked with a query per
+    batch instead of one per row. Set unique_fields to update the existing rows
+    with the same values of them instead, if the database supports it. When a
+    batch fails, its rows are created one by one to find the wrong ones.
+
+    The rows with errors are written to a CSV report, that is downloaded with the
+    export views.
+    """
+
+    form_class: Type[forms.ModelForm] = forms.ModelForm
+    formats: Optional[List[str]] = None
+    batch_size: int = 1000
+    unique_fields: List[str] = []
+    error_preview_size: int = 10
+    fast_insert: bool = True
+
+    def get_import_format(self, filename: str) -> ExportFormat:
+        """Gets the format of the file, raising ValidationError if it can't be
+        imported."""
+        import_format = get_format_for_file(filename)
+        if (
+            import_format is None
+            or type(import_format).read is ExportFormat.read
+            or (self.formats is not None and import_format.name not in self.formats)
+        ):
+            raise ValidationError(_("The format of the file is not supported."))
+        return import_format
+
+    def get_row_data(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Gets the data of the form from a row of the file."""
+        return {
+            str(key).strip(): "" if value is None else value
+            for key, value in row.items()
+        }
+
+    def get_validation_form_class(self) -> Type[forms.ModelForm]:
+        """Gets the form_class without the unique checks, done by batch."""
+        return type(
+            self.form_class.__name__,
+            (self.form_class,),
+            {"validate_unique": lambda form: None},
+        )
+
+    def get_unique_fields_to_check(
+        self, form_class: Type[forms.ModelForm]
+    ) -> List[str]:
+        options = form_class._meta.model._meta
+        return [
+            name
+            for name in form_class.base_fields
+            if name not in self.unique_fields
+            and name in {field.name for field in options.concrete_fields}
+            and options.get_field(name).unique
+            and not options.get_field(name).primary_key
+        ]
+
+    def check_unique(
+        self,
+        batch: List[ImportRow],
+        report: ErrorReport,
+        form_class: Type[forms.ModelForm],
+    ) -> List[ImportRow]:
+        """Removes the rows of the batch whose unique fields repeat the values of a
+        previous row or of the database, adding them to the report."""
+        if not batch:
+            return batch
+        model = form_class._meta.model
+        invalid = set()
+        for name in self.get_unique_fields_to_check(form_class):
+            message = _("%(field)s: A row with this value already exists.") % {
+                "field": name
+            }
+            values = {item.cleaned_data.get(name) for item in batch}
+            values.discard(None)
+            seen = set(
+                model._default_manager.filter(**{f"{name}__in": values}).values_list(
+                    name, flat=True
+                )
+            )
+            for item in batch:
+                value = item.cleaned_data.get(name)
+                if value is None or item.row in invalid:
+                    continue
+                if value in seen:
+                    invalid.add(item.row)
+                    report.add(item.row, item.data, message)
+                seen.add(value)
+        return [item for item in batch if item.row not in invalid]
+
+    def get_bulk_create_kwargs(self, form_class: Type[forms.ModelForm]) -> Dict:
+        """Uses update_conflicts for the unique_fields where it's supported."""
+        model = form_class._meta.model
+        connection = connections[router.db_for_write(model)]
+        if not self.unique_fields or not (
+            connection.features.supports_update_conflicts_with_target
+        ):
+            return {}
+        names = {field.name for field in model._meta.concrete_fields}
+        return {
+            "update_conflicts": True,
+            "unique_fields": self.unique_fields,
+            "update_fields": [
+                name
+                for name in form_class.base_fields
+                if name in names and name not in self.unique_fields
+            ],
+        }
+
+    def get_m2m_fields(self, form_class: Type[forms.ModelForm]) -> List[models.Field]:
+        """Gets the fields of the form saved after the instances, as save_m2m does."""
+        options = form_class._meta.model._meta
+        return [
+            field
+            for field in chain(options.many_to_many, options.private_fields)
+            if hasattr(field, "save_form_data") and field.name in form_class.base_fields
+        ]
+
+    def set_upserted_pks(self, model: Type[models.Model], instances: List):
+        """Sets the pk of the upserted instances, that some databases don't return,
+        looking them up by the unique_fields."""
+        missing = [instance for instance in instances if instance.pk is None]
+        if not missing:
+            return
+        attnames = [model._meta.get_field(name).attname for name in self.unique_fields]
+        conditions = Q()
+        for instance in missing:
+            conditions |= Q(
+                **{attname: getattr(instance, attname) for attname in attnames}
+            )
+        pks = {
+            tuple(values[:-1]): values[-1]
+            for values in model._default_manager.filter(conditions).values_list(
+                *attnames, "pk"
+            )
+        }
+        for instance in missing:
+            instance.pk = pks.get(
+                tuple(getattr(instance, attname) for attname in attnames)
+            )
+
+    def save_rows(
+        self,
+        rows: List[ImportRow],
+        form_class: Type[forms.ModelForm],
+        kwargs: Dict,
+        using: str,
+    ):
+        """Creates the rows in a transaction, with their many to many values."""
+        model = form_class._meta.model
+        m2m_fields = self.get_m2m_fields(form_class)
+        instances = [item.instance for item in rows]
+        with transaction.atomic(using=using):
+            if (
+                self.fast_insert
+                and not kwargs
+                and not m2m_fields
+                and insert_objects(model, instances, using)
+            ):
+                return
+            model._default_manager.bulk_create(instances, **kwargs)
+            if not m2m_fields:
+                return
+            if kwargs.get("update_conflicts"):
+                self.set_upserted_pks(model, instances)
+            for item in rows:
+                for field in m2m_fields:
+                    if field.name in item.cleaned_data:
+                        field.save_form_data(
+                            item.instance, item.cleaned_data[field.name]
+                        )
+
+    def save_batch(
+        self,
+        batch: List[ImportRow],
+        report: ErrorReport,
+        form_class: Type[forms.ModelForm],
+    ) -> int:
+        """Creates the rows of the batch, returning the number of created rows."""
+        if not batch:
+            return 0
+        kwargs = self.get_bulk_create_kwargs(form_class)
+        using = router.db_for_write(form_class._meta.model)
+        try:
+            self.save_rows(batch, form_class, kwargs, using)
+            return len(batch)
+        except (DatabaseError, ValueError):
+            pass
+        # Creates one by one to find the wrong rows
+        count = 0
+        for item in batch:
+            try:
+                self.save_rows([item], form_class, kwargs, using)
+                count += 1
+            except (DatabaseError, ValueError) as error:
+                report.add(item.row, item.data, str(error))
+        return count
+
+    def import_file(self, file: Any, dry_run: bool = False) -> ImportResult:
+        """Imports the rows of the uploaded file. With dry_run, the rows are only
+        validated, so the unique values repeated in different batches are not
+        found."""
+        import_format = self.get_import_format(file.name)
+        validator = RowValidator(self.get_validation_form_class())
+        form_class = validator.form_class
+        report = ErrorReport(self.error_preview_size)
+        rows = imported = 0
+        try:
+            for chunk in chunked(import_format.read(file), self.batch_size):
+                batch = []
+                for data in chunk:
+                    rows += 1
+                    data = self.get_row_data(data)
+                    form = validator.validate(data)
+                    if form.is_valid():
+                        batch.append(
+                            ImportRow(rows, data, form.instance, form.cleaned_data)
+                        )
+                    else:
+                        report.add(rows, data, format_errors(form.errors))
+                batch = self.check_unique(batch, report, form_class)
+                if dry_run:
+                    imported += len(batch)
+                else:
+                    imported += self.save_batch(batch, report, form_class)
+            job = report.save(
+                self.request.user.pk,  # type: ignore
+                f"{os.path.splitext(file.name)[0]}_errors.csv",
+            )
+        finally:
+            report.close()
+        return ImportResult(rows, imported, report.count, report.preview, job)
+
+
 ExportMixin = CSVExportMixin  # Alias for compatibility
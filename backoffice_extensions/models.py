@@ -0,0 +1,43 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class StatisticsBucket(models.Model):
+    """Precomputed value of a rollup for the period (day, week, month...) that
+    starts in the given date."""
+
+    rollup = models.CharField(_("rollup"), max_length=100)
+    period = models.CharField(_("period"), max_length=16)
+    start = models.DateField(_("start"))
+    value = models.FloatField(_("value"), null=True)
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("statistics bucket")
+        verbose_name_plural = _("statistics buckets")
+        ordering = ["rollup", "period", "start"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["rollup", "period", "start"],
+                name="backoffice_unique_statistics_bucket",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.rollup} ({self.period} {self.start}): {self.value}"
+
+
+class StatisticsWatermark(models.Model):
+    """Last value of the changed field of the rows included in a rollup, so the
+    next update only recomputes the buckets of the newer rows."""
+
+    rollup = models.CharField(_("rollup"), max_length=100, unique=True)
+    watermark = models.DateTimeField(_("watermark"), null=True)
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("statistics watermark")
+        verbose_name_plural = _("statistics watermarks")
+
+    def __str__(self):
+        return f"{self.rollup}: {self.watermark}"
@@ -0,0 +1,342 @@
+import base64
+import binascii
+import collections.abc
+import datetime
+import json
+import math
+from typing import Any, List, Optional, Sequence, Tuple
+
+from django.core.cache import caches
+from django.core.exceptions import (
+    EmptyResultSet,
+    ImproperlyConfigured,
+    ValidationError,
+)
+from django.core.paginator import EmptyPage, InvalidPage, Page, PageNotAnInteger
+from django.core.paginator import Paginator as DjangoPaginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+from backoffice_extensions.queries import get_estimated_count, get_query_fingerprint
+
+NEXT = "n"
+PREVIOUS = "p"
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    """Keeps the microseconds of the times, that DjangoJSONEncoder truncates, as
+    the cursor values have to match exactly the stored ones.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _with_results(queryset: "models.QuerySet", rows: List) -> "models.QuerySet":
+    """Keeps a queryset as object_list, like the Django Page, so the templates can
+    still access to the model, but with the already fetched rows.
+    """
+    queryset = queryset.all()
+    queryset._result_cache = rows
+    queryset._prefetch_done = True
+    return queryset
+
+
+class KeysetPage(collections.abc.Sequence):
+    """Page of a KeysetPaginator. It follows the interface of the Django Page, but
+    next_page_number and previous_page_number return opaque cursors instead of
+    numbers, so the pagination templates can use them in the same way.
+    """
+
+    def __init__(
+        self,
+        object_list: "models.QuerySet",
+        paginator: "KeysetPaginator",
+        has_next: bool,
+        has_previous: bool,
+    ):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.number = None
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f"<Keyset page of {len(self.object_list)} objects>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self) -> str:
+        return self.paginator.get_cursor(self[len(self) - 1], NEXT)
+
+    def previous_page_number(self) -> str:
+        return self.paginator.get_cursor(self[0], PREVIOUS)
+
+
+class KeysetPaginator:
+    """Paginator that seeks the rows after (or before) the last seen values of the
+    ordering fields instead of using OFFSET, so every page costs the same no matter
+    how deep it is, and that doesn't need to count the rows.
+
+    The ordering is taken from the queryset (or the model Meta) and the primary
+    key is added at the end to make it unique. Only field names are supported as
+    ordering and those fields should not be nullable.
+    """
+
+    uses_count: bool = False
+
+    def __init__(
+        self,
+        object_list: "models.QuerySet",
+        per_page: int,
+        orphans: int = 0,
+        allow_empty_first_page: bool = True,
+        ordering: Optional[Sequence[str]] = None,
+    ):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.allow_empty_first_page = allow_empty_first_page
+        self.ordering = self._get_ordering(ordering)
+
+    def _get_ordering(
+        self, ordering: Optional[Sequence[str]]
+    ) -> List[Tuple[str, bool]]:
+        """Gets the ordering as a list of (field, descending) tuples."""
+        if ordering is None:
+            query = self.object_list.query
+            ordering = query.order_by or (
+                self.object_list.model._meta.ordering if query.default_ordering else []
+            )
+        result = []
+        for field in ordering:
+            if not isinstance(field, str) or field == "?":
+                raise ImproperlyConfigured(
+                    "KeysetPaginator only supports ordering by field names."
+                )
+            descending = field.startswith("-")
+            result.append((field.lstrip("-+"), descending))
+        pk_names = {"pk", self.object_list.model._meta.pk.name}
+        if not any(field in pk_names for field, _ in result):
+            result.append(("pk", False))
+        return result
+
+    def _get_order_by(self, reverse: bool) -> List[str]:
+        return [
+            f"-{field}" if descending != reverse else field
+            for field, descending in self.ordering
+        ]
+
+    def _get_filter(self, values: List, reverse: bool) -> Q:
+        """Builds the condition to get the rows after the given values:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        for index, (field, descending) in enumerate(self.ordering):
+            lookup = "lt" if descending != reverse else "gt"
+            equals = {
+                previous: values[i]
+                for i, (previous, _) in enumerate(self.ordering[:index])
+            }
+            condition |= Q(**equals, **{f"{field}__{lookup}": values[index]})
+        return condition
+
+    @staticmethod
+    def _get_value(obj: Any, field: str) -> Any:
+        for attribute in field.split(LOOKUP_SEP):
+            obj = getattr(obj, attribute)
+        return obj.pk if isinstance(obj, models.Model) else obj
+
+    def get_cursor(self, obj: Any, direction: str) -> str:
+        """Encodes the values of the ordering fields of obj as an opaque cursor."""
+        values = [self._get_value(obj, field) for field, _ in self.ordering]
+        data = json.dumps([direction, values], cls=CursorJSONEncoder)
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str) -> Tuple[str, List]:
+        """Gets the direction and the values from the given cursor."""
+        try:
+            padding = "=" * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        except (binascii.Error, TypeError, ValueError):
+            raise InvalidPage("Invalid cursor.")
+        if (
+            direction not in (NEXT, PREVIOUS)
+            or not isinstance(values, list)
+            or len(values) != len(self.ordering)
+        ):
+            raise InvalidPage("Invalid cursor.")
+        return direction, values
+
+    def page(self, cursor: Optional[str] = None) -> KeysetPage:
+        """Returns the page that starts after the cursor, or the first one."""
+        direction, values = self.decode_cursor(cursor) if cursor else (NEXT, None)
+        reverse = direction == PREVIOUS
+        queryset = self.object_list.order_by(*self._get_order_by(reverse))
+        if values is not None:
+            try:
+                queryset = queryset.filter(self._get_filter(values, reverse))
+            except (TypeError, ValueError, ValidationError):
+                # The values of the cursor can't be converted to the fields
+                raise InvalidPage("Invalid cursor.")
+        rows = list(queryset[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if not rows and values is None and not self.allow_empty_first_page:
+            raise InvalidPage("That page contains no results")
+        if reverse:
+            rows.reverse()
+        object_list = _with_results(queryset, rows)
+        if reverse:
+            return KeysetPage(
+                object_list, self, has_next=bool(rows), has_previous=has_more
+            )
+        has_previous = values is not None and bool(rows)
+        return KeysetPage(
+            object_list, self, has_next=has_more, has_previous=has_previous
+        )
+
+
+class CountlessPage(Page):
+    """Page of a CountlessPaginator, that knows if there is a next page without
+    knowing the total of pages.
+    """
+
+    def __init__(self, object_list, number, paginator, has_next: bool):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def start_index(self) -> int:
+        if not len(self):
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self) -> int:
+        return (self.number - 1) * self.paginator.per_page + len(self)
+
+
+class CountlessPaginator(DjangoPaginator):
+    """Paginator that doesn't count the rows. It fetches per_page + 1 rows to know
+    if there is a next page, so num_pages is None and there is no last page.
+    """
+
+    uses_count: bool = False
+
+    @property
+    def num_pages(self) -> Optional[int]:  # type: ignore
+        return None
+
+    def validate_number(self, number) -> int:
+        """Validates the given 1-based page number, without checking the upper
+        bound."""
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_("That page number is not an integer"))
+        if number < 1:
+            raise EmptyPage(_("That page number is less than 1"))
+        return number
+
+    def page(self, number) -> CountlessPage:
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        queryset = self.object_list[bottom : bottom + self.per_page + 1]
+        rows = list(queryset)
+        has_next = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if not rows and (number > 1 or not self.allow_empty_first_page):
+            raise EmptyPage(_("That page contains no results"))
+        if isinstance(queryset, models.QuerySet):
+            rows = _with_results(queryset, rows)
+        return CountlessPage(rows, number, self, has_next=has_next)
+
+
+class EstimatedCountPaginator(CountlessPaginator):
+    """Paginator that shows the row estimate of the database planner as total,
+    when it's above exact_count_threshold, and counts the rows otherwise. The pages
+    are fetched as in the CountlessPaginator, so a wrong estimate never hides rows.
+    Databases without estimates always use the exact count.
+    """
+
+    uses_count = True
+    exact_count_threshold: int = 10000
+
+    def __init__(self, *args, exact_count_threshold: Optional[int] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if exact_count_threshold is not None:
+            self.exact_count_threshold = exact_count_threshold
+        self.count_is_estimated = False
+
+    @cached_property
+    def count(self) -> int:  # type: ignore
+        if isinstance(self.object_list, models.QuerySet):
+            estimate = get_estimated_count(self.object_list)
+            if estimate is not None and estimate >= self.exact_count_threshold:
+                self.count_is_estimated = True
+                return estimate
+        return super().count
+
+    @property
+    def num_pages(self) -> Optional[int]:  # type: ignore
+        if self.count == 0 and not self.allow_empty_first_page:
+            return 0
+        hits = max(1, self.count - self.orphans)
+        return math.ceil(hits / self.per_page)
+
+
+class CachedCountPaginator(DjangoPaginator):
+    """Paginator that caches the exact count by query fingerprint during
+    count_cache_timeout seconds.
+    """
+
+    count_cache_timeout: int = 300
+    count_cache_alias: str = "default"
+
+    def __init__(self, *args, count_cache_timeout: Optional[int] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if count_cache_timeout is not None:
+            self.count_cache_timeout = count_cache_timeout
+
+    def get_count_cache_key(self) -> Optional[str]:
+        """Gets the cache key from the SQL of the query and its parameters."""
+        if not isinstance(self.object_list, models.QuerySet):
+            return None
+        return f"backoffice:count:{get_query_fingerprint(self.object_list)}"
+
+    @cached_property
+    def count(self) -> int:  # type: ignore
+        try:
+            key = self.get_count_cache_key()
+        except EmptyResultSet:
+            return 0
+        if key is None:
+            return super().count
+        cache = caches[self.count_cache_alias]
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, self.count_cache_timeout)
+        return count
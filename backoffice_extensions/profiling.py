@@ -0,0 +1,163 @@
+import contextlib
+import contextvars
+import logging
+import time
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+)
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from backoffice_extensions import settings as backoffice_settings
+
+if TYPE_CHECKING:
+    from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+_profile: contextvars.ContextVar = contextvars.ContextVar(
+    "backoffice_profile", default=None
+)
+
+
+class Timing:
+    """Accumulated time, in seconds, and queries of a phase."""
+
+    __slots__ = ("duration", "queries", "calls")
+
+    def __init__(self):
+        self.duration = 0.0
+        self.queries = 0
+        self.calls = 0
+
+
+class Profile:
+    """Timings of the phases of a request. The queries are counted with an
+    execute wrapper in every connection, so DEBUG is not needed. Phases can be
+    nested, each one includes the time of its children.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.timings: Dict[str, Timing] = {}
+        self.queries = 0
+        self.duration = 0.0
+
+    def _count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[Timing]:
+        timing = self.timings.setdefault(name, Timing())
+        queries = self.queries
+        start = time.perf_counter()
+        try:
+            yield timing
+        finally:
+            timing.duration += time.perf_counter() - start
+            timing.queries += self.queries - queries
+            timing.calls += 1
+
+    def add(self, name: str, duration: float):
+        """Adds time to a phase without queries, for the hot loops."""
+        timing = self.timings.setdefault(name, Timing())
+        timing.duration += duration
+        timing.calls += 1
+
+    def get_server_timing(self) -> str:
+        """Formats the timings as a Server-Timing header value."""
+        metrics = [
+            f'{name.replace(":", "-")};dur={timing.duration * 1000:.2f};'
+            f'desc="{timing.calls} calls, {timing.queries} queries"'
+            for name, timing in self.timings.items()
+        ]
+        metrics.append(
+            f'total;dur={self.duration * 1000:.2f};desc="{self.queries} queries"'
+        )
+        return ", ".join(metrics)
+
+
+def get_profile() -> Optional[Profile]:
+    """Gets the profile of the current request, if it's being profiled."""
+    return _profile.get()
+
+
+@contextlib.contextmanager
+def profile_phase(name: str) -> Iterator[None]:
+    """Times the block as a phase of the current profile, if any."""
+    profile = _profile.get()
+    if profile is None:
+        yield
+        return
+    with profile.phase(name):
+        yield
+
+
+def _count_queries(stack: contextlib.ExitStack, profile: Profile):
+    """Counts the queries of the connections of the current thread."""
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(profile._count_query))
+
+
+@contextlib.contextmanager
+def profile_request(name: str) -> Iterator[Profile]:
+    """Profiles the block, sending the result to the metrics hook at the end."""
+    profile = Profile(name)
+    token = _profile.set(profile)
+    start = time.perf_counter()
+    try:
+        with contextlib.ExitStack() as stack:
+            _count_queries(stack, profile)
+            yield profile
+    finally:
+        profile.duration = time.perf_counter() - start
+        _profile.reset(token)
+    get_metrics_hook()(profile)
+
+
+@contextlib.asynccontextmanager
+async def aprofile_request(name: str) -> AsyncIterator[Profile]:
+    """Async version of profile_request. The connections are per thread, so the
+    queries are counted in the thread where the async ORM runs them."""
+    profile = Profile(name)
+    token = _profile.set(profile)
+    start = time.perf_counter()
+    stack = contextlib.ExitStack()
+    try:
+        await sync_to_async(_count_queries)(stack, profile)
+        yield profile
+    finally:
+        await sync_to_async(stack.close)()
+        profile.duration = time.perf_counter() - start
+        _profile.reset(token)
+    get_metrics_hook()(profile)
+
+
+def log_metrics(profile: Profile):
+    """Default metrics hook, that logs the timings in debug level. Replace it in
+    the PROFILING_METRICS_HOOK setting with a function that sends them to statsd,
+    Prometheus, etc."""
+    logger.debug("%s: %s", profile.name, profile.get_server_timing())
+
+
+def get_metrics_hook() -> Callable[[Profile], None]:
+    hook = backoffice_settings.get_settings().PROFILING_METRICS_HOOK
+    if hook is None:
+        return log_metrics
+    return import_string(hook)
+
+
+def add_server_timing(response: "HttpResponse", profile: Profile):
+    server_timing: List[str] = [profile.get_server_timing()]
+    if response.has_header("Server-Timing"):
+        server_timing.insert(0, response["Server-Timing"])
+    response["Server-Timing"] = ", ".join(server_timing)
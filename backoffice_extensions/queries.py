@@ -0,0 +1,166 @@
+import hashlib
+import json
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional, Tuple, Type
+
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist
+from django.db import connections
+from django.db.models.constants import LOOKUP_SEP
+
+if TYPE_CHECKING:
+    from django.db import models
+
+# Fields used as version of the objects if the view doesn't set one
+VERSION_FIELDS = ("modified", "updated_at")
+
+
+def get_field_name(field: Any) -> str:
+    """Gets the name of a field declared in list_display, fields, etc. that can be
+    a tuple with the name and the label.
+    """
+    if isinstance(field, tuple) and len(field) > 0:
+        return field[0]
+    return field
+
+
+def get_version_field(model: Type["models.Model"]) -> Optional[str]:
+    """Gets the first of the VERSION_FIELDS that the model has."""
+    names = {field.name for field in model._meta.concrete_fields}
+    return next((name for name in VERSION_FIELDS if name in names), None)
+
+
+def get_relation(model: Type["models.Model"], name: str) -> Optional[Any]:
+    """Gets the relation field of the model with the given name. The name can be
+    the field name, the query name of a reverse relation or its accessor name.
+    Returns None if the name is not a relation, like local columns, foreign key
+    attnames, properties or methods.
+    """
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        field = next(
+            (
+                related
+                for related in model._meta.related_objects
+                if related.get_accessor_name() == name
+            ),
+            None,
+        )
+    if field is None or not field.is_relation:
+        return None
+    if getattr(field, "attname", None) == name and field.name != name:
+        return None
+    return field
+
+
+def is_to_many(field: Any) -> bool:
+    """Checks if the relation can point to more than one object."""
+    return bool(field.many_to_many or field.one_to_many)
+
+
+def has_to_many_joins(queryset: "models.QuerySet") -> bool:
+    """Checks if the query joins a to-many relation, so it can return duplicated
+    rows."""
+    query = queryset.query
+    return any(
+        query.alias_refcount.get(alias)
+        and getattr(join, "join_field", None) is not None
+        and is_to_many(join.join_field)
+        for alias, join in query.alias_map.items()
+    )
+
+
+def is_column_path(model: Type["models.Model"], path: str) -> bool:
+    """Checks if the path points to a database column of the model, or of a model
+    related through forward to-one relations (like owner__email), so its value
+    can be fetched with values_list. Relations themselves, properties and methods
+    are not columns.
+    """
+    current = model
+    *relations, name = path.split(LOOKUP_SEP)
+    for part in relations:
+        relation = get_relation(current, part)
+        # Only forward relations, reverse one to ones raise if there is no object
+        if relation is None or is_to_many(relation) or not relation.concrete:
+            return False
+        current = relation.related_model
+    try:
+        field = current._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    if not field.concrete or (field.is_relation and is_to_many(field)):
+        return False
+    return not field.is_relation or field.attname == name
+
+
+def get_related_lookups(
+    model: Type["models.Model"], fields: Iterable
+) -> Tuple[List[str], List[str]]:
+    """Inspects the model meta to get the lookups that should be passed to
+    select_related and prefetch_related to load the given fields, avoiding a query
+    per row. Fields that are not relations are ignored.
+    """
+    select_related: List[str] = []
+    prefetch_related: List[str] = []
+    for field in fields:
+        current = model
+        lookup: List[str] = []
+        prefetch = False
+        for part in get_field_name(field).split(LOOKUP_SEP):
+            relation = get_relation(current, part) if current else None
+            if relation is None:
+                break
+            lookup.append(part)
+            current = relation.related_model
+            if is_to_many(relation) or current is None:
+                # Generic foreign keys don't have a related model, they can only
+                # be prefetched
+                prefetch = True
+        if not lookup:
+            continue
+        path = LOOKUP_SEP.join(lookup)
+        target = prefetch_related if prefetch else select_related
+        if path not in target:
+            target.append(path)
+    return select_related, prefetch_related
+
+
+def optimize_queryset(
+    queryset: "models.QuerySet", fields: Iterable
+) -> "models.QuerySet":
+    """Adds the select_related and prefetch_related needed to load the given
+    fields to the queryset.
+    """
+    select_related, prefetch_related = get_related_lookups(queryset.model, fields)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    return queryset
+
+
+def get_estimated_count(queryset: "models.QuerySet") -> Optional[int]:
+    """Gets the number of rows estimated by the database planner for the given
+    queryset. Only PostgreSQL is supported, for the rest it returns None.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    query = queryset.order_by().query
+    try:
+        sql, params = query.get_compiler(connection=connection).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+    except (EmptyResultSet, ValueError):
+        return None
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def get_query_fingerprint(queryset: "models.QuerySet") -> str:
+    """Gets a hash of the SQL of the queryset and its parameters, that identifies
+    the query. Raises EmptyResultSet if the query can't match any row.
+    """
+    sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+    return hashlib.md5(f"{queryset.db}:{sql}:{params!r}".encode()).hexdigest()
@@ -0,0 +1,127 @@
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import (
+    NoReverseMatch,
+    URLPattern,
+    URLResolver,
+    get_resolver,
+    get_script_prefix,
+    get_urlconf,
+    reverse,
+)
+
+# Values used to reverse the details URLs once, to be replaced later by the pk
+SENTINELS: Dict[type, Any] = {
+    int: 7395128406173952840,
+    uuid.UUID: uuid.UUID("7d1c0b8e-3f5a-4e2b-9c6d-0a8b7e6f5d4c"),
+}
+
+# Parts of the NoReverseMatch messages of the views and namespaces that don't exist
+MISSING_VIEW_MESSAGES = (
+    "is not a valid view function or pattern name",
+    "is not a registered namespace",
+)
+
+_MISSING = object()
+_FALLBACK = object()
+_urls: Dict = {}
+_templates: Dict = {}
+
+
+def _get_cache_key(*parts) -> tuple:
+    return (get_urlconf(), get_script_prefix(), *parts)
+
+
+def clear_url_cache():
+    """Clears the cached URLs and URL templates."""
+    _urls.clear()
+    _templates.clear()
+
+
+@receiver(setting_changed)
+def _clear_url_cache_on_setting_changed(setting, **kwargs):
+    if setting == "ROOT_URLCONF":
+        clear_url_cache()
+
+
+def cached_reverse(viewname: str) -> str:
+    """Reverses the given view without arguments, caching the result per URLconf.
+    Raises NoReverseMatch as reverse does.
+    """
+    key = _get_cache_key(viewname)
+    url = _urls.get(key)
+    if url is None:
+        try:
+            url = reverse(viewname)
+        except NoReverseMatch:
+            url = _MISSING
+        _urls[key] = url
+    if not isinstance(url, str):
+        raise NoReverseMatch(f"Reverse for '{viewname}' not found.")
+    return url
+
+
+def reverse_or_empty(viewname: str) -> str:
+    """Cached reverse of the given view, or an empty string if it doesn't exist."""
+    try:
+        return cached_reverse(viewname)
+    except NoReverseMatch:
+        return ""
+
+
+def _get_url_template(viewname: str, lookup_field: str, value_type: type) -> Any:
+    """Reverses the view with the sentinel of the value type and turns the URL
+    into a template where the sentinel is the only replacement field.
+    """
+    sentinel = SENTINELS[value_type]
+    try:
+        url = reverse(viewname, kwargs={lookup_field: sentinel})
+    except NoReverseMatch as error:
+        # Only a view that doesn't exist is missing for every value. Patterns that
+        # reject the sentinel, like the ones with length limits, are reversed
+        # with each value
+        if any(message in str(error) for message in MISSING_VIEW_MESSAGES):
+            return _MISSING
+        return _FALLBACK
+    url = url.replace("{", "{{").replace("}", "}}")
+    if url.count(str(sentinel)) != 1:
+        return _FALLBACK
+    return url.replace(str(sentinel), "{}")
+
+
+def get_details_url(viewname: str, lookup_field: str, value: Any) -> str:
+    """Gets the URL of the given view with the value as the lookup_field kwarg.
+    For integer and UUID values, the view is reversed only once per URLconf and
+    the URL is built formatting a template. For the rest of values, reverse is
+    called each time. Raises NoReverseMatch as reverse does.
+    """
+    value_type = type(value)
+    if value_type not in SENTINELS or (value_type is int and value < 0):
+        return reverse(viewname, kwargs={lookup_field: value})
+    key = _get_cache_key(viewname, lookup_field, value_type)
+    template: Optional[Any] = _templates.get(key)
+    if template is None:
+        template = _get_url_template(viewname, lookup_field, value_type)
+        _templates[key] = template
+    if template is _MISSING:
+        raise NoReverseMatch(f"Reverse for '{viewname}' not found.")
+    if template is _FALLBACK:
+        return reverse(viewname, kwargs={lookup_field: value})
+    return template.format(value)
+
+
+def get_view_classes(patterns: Optional[List] = None) -> Iterator[type]:
+    """Walks the URL patterns, by default the ones of the root URLconf, yielding
+    the class based views."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from get_view_classes(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            view_class = getattr(pattern.callback, "view_class", None)
+            if view_class is not None:
+                yield view_class
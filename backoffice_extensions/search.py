@@ -0,0 +1,217 @@
+from functools import reduce
+from typing import TYPE_CHECKING, List, Optional, Type
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, models
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.expressions import RawSQL
+
+from backoffice_extensions.queries import get_relation, has_to_many_joins, is_to_many
+
+try:
+    from django.contrib.postgres.search import SearchQuery, SearchVector
+except ImportError:
+    SearchQuery = SearchVector = None
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+
+class SearchBackend:
+    """Base class for the search backends used by the SearchListMixin. A backend
+    filters a queryset of the model with the search query over the search_fields.
+    Backends that need an index set supports_index to True and implement
+    build_index, which is called from the backoffice_search_index command.
+    """
+
+    supports_index: bool = False
+
+    def __init__(self, model: Type[models.Model], search_fields: List[str]):
+        self.model = model
+        self.search_fields = list(search_fields)
+
+    def filter(self, queryset: "QuerySet", search_query: str) -> "QuerySet":
+        raise NotImplementedError("Search backends should implement filter.")
+
+    def build_index(self, using: str = "default") -> int:
+        """Builds or refreshes the index, returning the number of indexed rows."""
+        raise NotImplementedError(f"{self.__class__.__name__} has no index.")
+
+
+class IContainsSearchBackend(SearchBackend):
+    """Default backend, that ORs icontains lookups over the search_fields.
+
+    Local and forward relation paths are filtered directly, while paths that cross
+    a to-many relation are checked with a correlated EXISTS subquery, so the search
+    never duplicates the rows. DISTINCT is only kept when the queryset already
+    joins a to-many relation, as when filtered by one in the filterset.
+    """
+
+    def __init__(self, model: Type[models.Model], search_fields: List[str]):
+        super().__init__(model, search_fields)
+        self.to_many_fields = {
+            field for field in self.search_fields if self.is_to_many_path(field)
+        }
+
+    def is_to_many_path(self, path: str) -> bool:
+        """Checks if the path crosses a to-many relation."""
+        current = self.model
+        for part in path.split(LOOKUP_SEP):
+            relation = get_relation(current, part) if current else None
+            if relation is None:
+                return False
+            if is_to_many(relation):
+                return True
+            current = relation.related_model
+        return False
+
+    def get_condition(self, search_field: str, search_query: str) -> Q:
+        lookup = {f"{search_field}__icontains": search_query}
+        if search_field not in self.to_many_fields:
+            return Q(**lookup)
+        subquery = self.model._default_manager.filter(pk=OuterRef("pk"), **lookup)
+        return Q(Exists(subquery))
+
+    def filter(self, queryset: "QuerySet", search_query: str) -> "QuerySet":
+        queryset_filter = [
+            self.get_condition(search_field, search_query)
+            for search_field in self.search_fields
+        ]
+        if queryset_filter:
+            queryset = queryset.filter(reduce(lambda x, y: x | y, queryset_filter))
+            if has_to_many_joins(queryset):
+                queryset = queryset.distinct()
+        return queryset
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Full-text search backend for PostgreSQL. If vector_field is given, it
+    should be a SearchVectorField of the model, with a GIN index, that is filled
+    by build_index. Otherwise the vector is computed in each search.
+    """
+
+    def __init__(
+        self,
+        model: Type[models.Model],
+        search_fields: List[str],
+        vector_field: Optional[str] = None,
+        config: Optional[str] = None,
+        search_type: str = "websearch",
+    ):
+        if SearchVector is None:
+            raise ImproperlyConfigured(
+                "PostgresSearchBackend needs psycopg to be installed."
+            )
+        super().__init__(model, search_fields)
+        self.vector_field = vector_field
+        self.config = config
+        self.search_type = search_type
+        self.supports_index = vector_field is not None
+
+    def get_search_vector(self) -> "SearchVector":
+        return SearchVector(*self.search_fields, config=self.config)
+
+    def filter(self, queryset: "QuerySet", search_query: str) -> "QuerySet":
+        query = SearchQuery(
+            search_query, config=self.config, search_type=self.search_type
+        )
+        if self.vector_field:
+            return queryset.filter(**{self.vector_field: query})
+        return queryset.annotate(
+            backoffice_search_vector=self.get_search_vector()
+        ).filter(backoffice_search_vector=query)
+
+    def build_index(self, using: str = "default") -> int:
+        if not self.vector_field:
+            return super().build_index(using=using)
+        return self.model._default_manager.using(using).update(
+            **{self.vector_field: self.get_search_vector()}
+        )
+
+
+class SQLiteFTS5SearchBackend(SearchBackend):
+    """Full-text search backend for SQLite, that uses a FTS5 shadow table named
+    after the model table. The table is created and filled by build_index, so it
+    should be refreshed after the data changes. The rows are matched by rowid, so
+    the primary key of the model should be an integer. Useful for local testing.
+    """
+
+    supports_index = True
+
+    def __init__(self, model: Type[models.Model], search_fields: List[str]):
+        super().__init__(model, search_fields)
+        pk = model._meta.pk
+        while pk.is_relation:
+            pk = pk.target_field
+        if not isinstance(pk, models.IntegerField):
+            raise ImproperlyConfigured(
+                f"{self.__class__.__name__} needs an integer primary key, and "
+                f"{model._meta.label} has a {pk.get_internal_type()}."
+            )
+
+    def get_table_name(self) -> str:
+        return f"{self.model._meta.db_table}_fts"
+
+    def get_column_names(self) -> List[str]:
+        return [field.replace(LOOKUP_SEP, "_") for field in self.search_fields]
+
+    @staticmethod
+    def get_match_query(search_query: str) -> str:
+        """Quotes each term, so FTS5 syntax is not interpreted, and searches them
+        as prefixes."""
+        terms = [
+            '"{}"*'.format(term.replace('"', '""')) for term in search_query.split()
+        ]
+        return " ".join(terms)
+
+    def filter(self, queryset: "QuerySet", search_query: str) -> "QuerySet":
+        match_query = self.get_match_query(search_query)
+        if not match_query:
+            return queryset
+        connection = connections[queryset.db]
+        if self.get_table_name() not in connection.introspection.table_names():
+            raise ImproperlyConfigured(
+                f"The search index of {self.model._meta.label} doesn't exist, "
+                "create it with the backoffice_search_index command."
+            )
+        table = connection.ops.quote_name(self.get_table_name())
+        sql = f"SELECT rowid FROM {table} WHERE {table} MATCH %s"
+        return queryset.filter(pk__in=RawSQL(sql, [match_query]))
+
+    def build_index(self, using: str = "default", batch_size: int = 2000) -> int:
+        connection = connections[using]
+        table = connection.ops.quote_name(self.get_table_name())
+        columns = ", ".join(
+            connection.ops.quote_name(column) for column in self.get_column_names()
+        )
+        placeholders = ", ".join(["%s"] * (len(self.search_fields) + 1))
+        insert = f"INSERT INTO {table} (rowid, {columns}) VALUES ({placeholders})"
+        rows = (
+            self.model._default_manager.using(using)
+            .order_by("pk")
+            .values_list("pk", *self.search_fields)
+            .iterator(chunk_size=batch_size)
+        )
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(f"CREATE VIRTUAL TABLE {table} USING fts5({columns})")
+            batch: List[List] = []
+            for row in rows:
+                # To-many search fields return a row per related object, their
+                # values are joined in the same document
+                if batch and batch[-1][0] == row[0]:
+                    for index, value in enumerate(row[1:], start=1):
+                        if value is not None:
+                            batch[-1][index] = f"{batch[-1][index] or ''} {value}"
+                    continue
+                if len(batch) >= batch_size:
+                    cursor.executemany(insert, batch)
+                    total += len(batch)
+                    batch = []
+                batch.append(list(row))
+            if batch:
+                cursor.executemany(insert, batch)
+                total += len(batch)
+        return total
@@ -1,6 +1,10 @@
-from typing import Any
+import contextlib
+import contextvars
+from typing import Any, Dict, Iterator, Optional, Tuple
 
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.utils.functional import cached_property
 
 # Needed to build and publish
 # ------------------------------------------------------------------------------
@@ -8,24 +12,137 @@ SECRET_KEY = "backoffice"
 
 # Specific project configuration
 # ------------------------------------------------------------------------------
-def get_backoffice_settings_attribute(attribute: str, default: Any) -> Any:
-    """Gets the value from the dict, depending on the BACKOFFICE_SITE value."""
-    site = getattr(settings, "BACKOFFICE_SITE", "default")
-    return getattr(settings, "BACKOFFICE", {}).get(site, {}).get(attribute, default)
-
-
-TITLE = get_backoffice_settings_attribute("TITLE", "backoffice")
-LOGO = get_backoffice_settings_attribute("LOGO", None)
-NONE_VALUE = get_backoffice_settings_attribute("NONE_VALUE", "-")
-NO_IMAGE_VALUE = get_backoffice_settings_attribute("NO_IMAGE_VALUE", NONE_VALUE)
-URL_NAMESPACE = get_backoffice_settings_attribute("URL_NAMESPACE", "backoffice")
-STATUS_FIELDS = get_backoffice_settings_attribute("STATUS_FIELDS", ("status",))
-STATUS_TAG_CLASSES = get_backoffice_settings_attribute("STATUS_TAG_CLASSES", {})
-DETAILS_URLS = get_backoffice_settings_attribute(
-    "DETAILS_URLS",
-    [
+# The settings of each site are read from BACKOFFICE[site] the first time they are
+# used, so they can be accessed as attributes of this module (for the active site)
+# or with get_settings(site).
+DEFAULTS: Dict[str, Any] = {
+    "TITLE": "backoffice",
+    "LOGO": None,
+    "NONE_VALUE": "-",
+    "NO_IMAGE_VALUE": None,  # NONE_VALUE by default
+    "URL_NAMESPACE": "backoffice",
+    "STATUS_FIELDS": ("status",),
+    "STATUS_TAG_CLASSES": {},
+    "DETAILS_URLS": [
         {"names": ("pk", "id"), "follow": False},
         {"names": ("user", "owner")},
     ],
+    "SIDEBAR_CONFIG": [],
+    "SIDEBAR_CACHE_TIMEOUT": 300,
+    "EXPORT_EXECUTOR": "thread",
+    "EXPORT_MAX_WORKERS": 2,
+    "EXPORT_DIRECTORY": "backoffice/exports",
+    "EXPORT_EXPIRATION": 86400,
+    "STATISTICS_MAX_WORKERS": 4,
+    "PROFILING": False,
+    "PROFILING_METRICS_HOOK": None,
+    "ROW_CACHE_TIMEOUT": 3600,
+    "ROW_CACHE_UNVERSIONED_TIMEOUT": 60,
+}
+
+_active: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "backoffice_site", default=None
 )
-SIDEBAR_CONFIG = get_backoffice_settings_attribute("SIDEBAR_CONFIG", [])
+_sites: Dict[Optional[str], "BackOfficeSettings"] = {}
+_namespaces: Dict[str, str] = {}
+
+
+class BackOfficeSettings:
+    """Settings of a backoffice site. Each value is resolved on first access and
+    kept, as the structures derived from them."""
+
+    def __init__(self, site: str):
+        self.site = site
+        self._values = getattr(settings, "BACKOFFICE", {}).get(site, {})
+
+    def __getattr__(self, name: str) -> Any:
+        if name not in DEFAULTS:
+            raise AttributeError(f"'{name}' is not a backoffice setting.")
+        default = DEFAULTS[name]
+        if name == "NO_IMAGE_VALUE":
+            default = self.NONE_VALUE
+        value = self._values.get(name, default)
+        setattr(self, name, value)
+        return value
+
+    @cached_property
+    def details_urls_index(self) -> Dict[str, Tuple[Tuple[bool, str], ...]]:
+        """The (follow, lookup_field) of the DETAILS_URLS rules of each name, in
+        the order they are declared."""
+        index: Dict[str, Tuple[Tuple[bool, str], ...]] = {}
+        for rule in self.DETAILS_URLS:
+            compiled = (rule.get("follow", True), rule.get("lookup_field") or "pk")
+            for name in rule.get("names", tuple()):
+                index[name] = index.get(name, tuple()) + (compiled,)
+        return index
+
+
+def get_site() -> str:
+    """Gets the active site, or the BACKOFFICE_SITE setting if there is none."""
+    site = _active.get()
+    if site is None:
+        site = getattr(settings, "BACKOFFICE_SITE", "default")
+    return site
+
+
+def activate(site: str):
+    """Activates the site for the current thread or task."""
+    _active.set(site)
+
+
+def deactivate():
+    """Goes back to the BACKOFFICE_SITE setting for the current thread or task."""
+    _active.set(None)
+
+
+@contextlib.contextmanager
+def override(site: str) -> Iterator[None]:
+    """Activates the site inside the block."""
+    token = _active.set(site)
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+
+def get_settings(site: Optional[str] = None) -> BackOfficeSettings:
+    """Gets the settings of the site, or the active one if not given."""
+    if site is None:
+        site = _active.get()
+    site_settings = _sites.get(site)
+    if site_settings is None:
+        # The settings of BACKOFFICE_SITE are also kept as None
+        name = get_site() if site is None else site
+        site_settings = _sites.setdefault(name, BackOfficeSettings(name))
+        _sites[site] = site_settings
+    return site_settings
+
+
+def get_namespace_site(namespace: str) -> Optional[str]:
+    """Gets the site whose URL_NAMESPACE is the given one, if any."""
+    if not _namespaces:
+        for site in getattr(settings, "BACKOFFICE", {}):
+            _namespaces.setdefault(get_settings(site).URL_NAMESPACE, site)
+    return _namespaces.get(namespace)
+
+
+def get_backoffice_settings_attribute(attribute: str, default: Any) -> Any:
+    """Gets the value from the dict, depending on the active site."""
+    return get_settings()._values.get(attribute, default)
+
+
+def reload_settings(setting: str, **kwargs):
+    """Discards the resolved settings when the Django ones change. Used as
+    setting_changed receiver."""
+    if setting in ("BACKOFFICE", "BACKOFFICE_SITE"):
+        _sites.clear()
+        _namespaces.clear()
+
+
+setting_changed.connect(reload_settings, dispatch_uid="backoffice_settings")
+
+
+def __getattr__(name: str) -> Any:
+    if name in DEFAULTS:
+        return getattr(get_settings(), name)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -0,0 +1,102 @@
+from typing import Any, List, Tuple
+
+from django.core.cache import cache
+
+from backoffice_extensions import settings as backoffice_settings
+from backoffice_extensions.resolvers import cached_reverse
+
+GENERATION_CACHE_KEY = "backoffice:sidebar:generation"
+
+
+def get_permissions_generation() -> int:
+    """Gets the current generation of the permissions, that changes every time a
+    group or a permission of any user changes."""
+    generation = cache.get(GENERATION_CACHE_KEY)
+    if generation is None:
+        cache.add(GENERATION_CACHE_KEY, 1, None)
+        generation = cache.get(GENERATION_CACHE_KEY, 1)
+    return generation
+
+
+def invalidate_sidebar_cache(**kwargs):
+    """Invalidates all the cached sidebars. It can be used as signal receiver."""
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        cache.set(GENERATION_CACHE_KEY, 1, None)
+
+
+def _invalidate_on_m2m_changed(action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_sidebar_cache()
+
+
+def connect_signals():
+    """Connects the signals that invalidate the sidebars when the permissions of
+    the users change."""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.models import Group, Permission
+    from django.db.models.signals import m2m_changed, post_delete, post_save
+
+    user_model = get_user_model()
+    for through in (
+        getattr(user_model, "groups", None),
+        getattr(user_model, "user_permissions", None),
+        Group.permissions,
+    ):
+        if through is not None and hasattr(through, "through"):
+            m2m_changed.connect(
+                _invalidate_on_m2m_changed,
+                sender=through.through,
+                dispatch_uid=f"backoffice_sidebar_{through.through._meta.label}",
+            )
+    for model in (Group, Permission):
+        for signal in (post_save, post_delete):
+            signal.connect(
+                invalidate_sidebar_cache,
+                sender=model,
+                dispatch_uid=f"backoffice_sidebar_{model._meta.label}",
+            )
+
+
+def get_user_cache_key(user: Any) -> str:
+    """Gets the part of the cache key that identifies the user and the flags that
+    change its permissions."""
+    if user is None or not user.is_authenticated:
+        return "anonymous"
+    return f"{user.pk}:{int(user.is_superuser)}:{int(user.is_active)}"
+
+
+def build_sidebar(user: Any) -> List[Tuple[Any, List[Tuple[str, Any]]]]:
+    """Builds the sidebar groups, with the URL and label of the sections the user
+    has permissions to see."""
+    site_settings = backoffice_settings.get_settings()
+    sidebar = []
+    for group in site_settings.SIDEBAR_CONFIG:
+        sections_data = []
+        for section, data in group.get("sections").items():
+            if data.get("permission") is None or (
+                user and user.has_perm(data.get("permission"))
+            ):
+                url = cached_reverse(
+                    f"{site_settings.URL_NAMESPACE}:{section.lower()}-list"
+                )
+                sections_data.append((url, data.get("label")))
+        # If the group is empty skip it
+        if sections_data:
+            sidebar.append((group.get("label"), sections_data))
+    return sidebar
+
+
+def get_sidebar(user: Any) -> List[Tuple[Any, List[Tuple[str, Any]]]]:
+    """Gets the sidebar of the user from the cache, building it if needed."""
+    site_settings = backoffice_settings.get_settings()
+    key = (
+        f"backoffice:sidebar:{site_settings.site}:{site_settings.URL_NAMESPACE}:"
+        f"{get_permissions_generation()}:{get_user_cache_key(user)}"
+    )
+    sidebar = cache.get(key)
+    if sidebar is None:
+        sidebar = build_sidebar(user)
+        cache.set(key, sidebar, site_settings.SIDEBAR_CACHE_TIMEOUT)
+    return sidebar
@@ -0,0 +1,418 @@
+import asyncio
+import collections
+import datetime
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models import Max
+from django.db.models.functions import Trunc
+
+from backoffice_extensions import settings as backoffice_settings
+from backoffice_extensions.helpers import StatisticsValue
+from backoffice_extensions.models import StatisticsBucket, StatisticsWatermark
+from backoffice_extensions.queries import get_query_fingerprint
+
+if TYPE_CHECKING:
+    from django.db.models import Aggregate
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+Series = collections.namedtuple("Series", ["points", "max_value"])
+
+
+class Statistic:
+    """Declares a value of a dashboard: the aggregate over the queryset, that can
+    be a callable returning it, cached during ttl seconds. During the following
+    stale_ttl seconds, the cached value is still shown while it's recomputed in
+    the background. The values are cached by name, aggregate and query, or by the
+    given key instead of the query. The query of the callables is built on every
+    call, so those whose query changes between calls (like filters by the current
+    time) should be given a key.
+    """
+
+    def __init__(
+        self,
+        queryset: Union["models.QuerySet", Callable[[], "models.QuerySet"]],
+        aggregate: "Aggregate",
+        ttl: int = 300,
+        stale_ttl: Optional[int] = None,
+        percentage: bool = False,
+        help_text: Optional[str] = None,
+        key: Optional[str] = None,
+    ):
+        self.queryset = queryset
+        self.aggregate = aggregate
+        self.ttl = ttl
+        self.stale_ttl = ttl if stale_ttl is None else stale_ttl
+        self.percentage = percentage
+        self.help_text = help_text
+        self.key = key
+        self._query_key: Optional[str] = None
+
+    def get_queryset(self) -> "models.QuerySet":
+        if callable(self.queryset):
+            return self.queryset()
+        return self.queryset.all()
+
+    @staticmethod
+    def _get_fingerprint(queryset: "models.QuerySet") -> str:
+        try:
+            return get_query_fingerprint(queryset)
+        except EmptyResultSet:
+            return f"{queryset.model._meta.label}:empty"
+
+    def get_query_key(self) -> str:
+        """Identifies the query of the statistic, computed only once unless it's
+        built by a callable."""
+        if self.key is not None:
+            return self.key
+        if callable(self.queryset):
+            return self._get_fingerprint(self.queryset())
+        if self._query_key is None:
+            self._query_key = self._get_fingerprint(self.queryset)
+        return self._query_key
+
+    def get_cache_key(self, name: str) -> str:
+        key = hashlib.md5(
+            f"{name}:{self.aggregate!r}:{self.get_query_key()}".encode()
+        ).hexdigest()
+        return f"backoffice:statistics:{key}"
+
+    def get_lock_key(self, name: str) -> str:
+        return f"{self.get_cache_key(name)}:refreshing"
+
+    def get_value(self, value: Any, computed_at: float) -> StatisticsValue:
+        return StatisticsValue(
+            value=value,
+            percentage=self.percentage,
+            help_text=self.help_text,
+            computed_at=datetime.datetime.fromtimestamp(
+                computed_at, tz=datetime.timezone.utc
+            ),
+        )
+
+
+def _get_executor() -> Optional[ThreadPoolExecutor]:
+    global _executor
+    max_workers = backoffice_settings.get_settings().STATISTICS_MAX_WORKERS
+    if max_workers <= 1:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="statistics"
+            )
+        return _executor
+
+
+def reset_executor(setting: str, **kwargs):
+    """Discards the executor when the backoffice settings change, so the next
+    computations use the new ones. Used as setting_changed receiver."""
+    global _executor
+    if setting in ("BACKOFFICE", "BACKOFFICE_SITE"):
+        with _executor_lock:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = None
+
+
+setting_changed.connect(reset_executor, dispatch_uid="backoffice_statistics")
+
+
+def _group_statistics(
+    statistics: Dict[str, Statistic]
+) -> List[Tuple["models.QuerySet", Dict[str, Statistic]]]:
+    """Groups the statistics by query, so the aggregates over the same rows are
+    computed in a single aggregate() call."""
+    groups: Dict[Any, Tuple["models.QuerySet", Dict[str, Statistic]]] = {}
+    for name, statistic in statistics.items():
+        queryset = statistic.get_queryset()
+        try:
+            key: Any = get_query_fingerprint(queryset)
+        except EmptyResultSet:
+            key = name
+        groups.setdefault(key, (queryset, {}))[1][name] = statistic
+    return list(groups.values())
+
+
+def _compute_group(
+    queryset: "models.QuerySet", statistics: Dict[str, Statistic]
+) -> Dict[str, StatisticsValue]:
+    """Computes the aggregates of the group and caches them."""
+    aliases = {f"statistic_{index}": name for index, name in enumerate(statistics)}
+    values = queryset.aggregate(
+        **{alias: statistics[name].aggregate for alias, name in aliases.items()}
+    )
+    computed_at = time.time()
+    results = {}
+    for alias, name in aliases.items():
+        statistic = statistics[name]
+        cache.set(
+            statistic.get_cache_key(name),
+            (values[alias], computed_at),
+            statistic.ttl + statistic.stale_ttl,
+        )
+        results[name] = statistic.get_value(values[alias], computed_at)
+    cache.delete_many([statistics[name].get_lock_key(name) for name in statistics])
+    return results
+
+
+def _compute_in_worker(
+    queryset: "models.QuerySet", statistics: Dict[str, Statistic]
+) -> Dict[str, StatisticsValue]:
+    try:
+        return _compute_group(queryset, statistics)
+    finally:
+        connections.close_all()
+
+
+def compute_statistics(statistics: Dict[str, Statistic]) -> Dict[str, StatisticsValue]:
+    """Computes the statistics without checking the cache, the groups of
+    aggregates in parallel."""
+    groups = _group_statistics(statistics)
+    executor = _get_executor()
+    results: Dict[str, StatisticsValue] = {}
+    if executor is None or len(groups) == 1:
+        for queryset, group in groups:
+            results.update(_compute_group(queryset, group))
+        return results
+    futures = [
+        executor.submit(_compute_in_worker, queryset, group)
+        for queryset, group in groups
+    ]
+    for future in futures:
+        results.update(future.result())
+    return results
+
+
+def _refresh_statistics(statistics: Dict[str, Statistic]):
+    """Recomputes the stale statistics in the background, once at a time."""
+    refreshing = {
+        name: statistic
+        for name, statistic in statistics.items()
+        if cache.add(statistic.get_lock_key(name), True, max(statistic.stale_ttl, 1))
+    }
+    if not refreshing:
+        return
+    executor = _get_executor()
+    for queryset, group in _group_statistics(refreshing):
+        if executor is None:
+            _compute_group(queryset, group)
+        else:
+            executor.submit(_compute_in_worker, queryset, group)
+
+
+def _read_cached(
+    statistics: Dict[str, Statistic], cached: Dict[str, Any]
+) -> Tuple[Dict[str, StatisticsValue], Dict[str, Statistic], Dict[str, Statistic]]:
+    """Splits the statistics in the cached values, the missing and the stale ones."""
+    now = time.time()
+    results: Dict[str, StatisticsValue] = {}
+    missing, stale = {}, {}
+    for name, statistic in statistics.items():
+        key = statistic.get_cache_key(name)
+        if key not in cached:
+            missing[name] = statistic
+            continue
+        value, computed_at = cached[key]
+        results[name] = statistic.get_value(value, computed_at)
+        if now - computed_at >= statistic.ttl:
+            stale[name] = statistic
+    return results, missing, stale
+
+
+def get_statistics(statistics: Dict[str, Statistic]) -> Dict[str, StatisticsValue]:
+    """Gets the values of the statistics, in the same order, from the cache. The
+    missing ones are computed and the stale ones are refreshed in the background.
+    """
+    cached = cache.get_many(
+        [statistic.get_cache_key(name) for name, statistic in statistics.items()]
+    )
+    results, missing, stale = _read_cached(statistics, cached)
+    if missing:
+        results.update(compute_statistics(missing))
+    if stale:
+        _refresh_statistics(stale)
+    return {name: results[name] for name in statistics}
+
+
+async def acompute_statistics(
+    statistics: Dict[str, Statistic]
+) -> Dict[str, StatisticsValue]:
+    """Async version of compute_statistics, that awaits the groups of aggregates
+    at the same time."""
+    groups = _group_statistics(statistics)
+    executor = _get_executor()
+    computations: List[Awaitable[Dict[str, StatisticsValue]]]
+    if executor is None or len(groups) == 1:
+        computations = [
+            sync_to_async(_compute_group)(queryset, group) for queryset, group in groups
+        ]
+    else:
+        computations = [
+            asyncio.wrap_future(executor.submit(_compute_in_worker, queryset, group))
+            for queryset, group in groups
+        ]
+    results: Dict[str, StatisticsValue] = {}
+    for values in await asyncio.gather(*computations):
+        results.update(values)
+    return results
+
+
+async def aget_statistics(
+    statistics: Dict[str, Statistic]
+) -> Dict[str, StatisticsValue]:
+    """Async version of get_statistics."""
+    cached = await cache.aget_many(
+        [statistic.get_cache_key(name) for name, statistic in statistics.items()]
+    )
+    results, missing, stale = _read_cached(statistics, cached)
+    if missing:
+        results.update(await acompute_statistics(missing))
+    if stale:
+        await sync_to_async(_refresh_statistics)(stale)
+    return {name: results[name] for name in statistics}
+
+
+class Rollup:
+    """Time series of the aggregate over the queryset, grouped in buckets by the
+    date_field truncated to each of the periods ("day", "week", "month"...). The
+    buckets are stored in StatisticsBucket by update, that only recomputes the
+    buckets of the rows whose changed_field (by default the date_field) is newer
+    than the watermark of the previous update. Deleted rows are not detected, use
+    full to recompute all the buckets.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        queryset: Union["models.QuerySet", Callable[[], "models.QuerySet"]],
+        date_field: str,
+        aggregate: "Aggregate",
+        periods: Sequence[str] = ("day",),
+        changed_field: Optional[str] = None,
+    ):
+        self.name = name
+        self.queryset = queryset
+        self.date_field = date_field
+        self.aggregate = aggregate
+        self.periods = periods
+        self.changed_field = changed_field or date_field
+
+    def get_queryset(self) -> "models.QuerySet":
+        if callable(self.queryset):
+            return self.queryset()
+        return self.queryset.all()
+
+    def _get_bucket_values(
+        self, queryset: "models.QuerySet", period: str, starts: Optional[set] = None
+    ) -> Dict[datetime.date, Any]:
+        queryset = queryset.annotate(
+            backoffice_bucket=Trunc(
+                self.date_field, period, output_field=models.DateField()
+            )
+        )
+        if starts is not None:
+            queryset = queryset.filter(backoffice_bucket__in=starts)
+        rows = (
+            queryset.order_by()
+            .values("backoffice_bucket")
+            .annotate(backoffice_value=self.aggregate)
+            .values_list("backoffice_bucket", "backoffice_value")
+        )
+        return dict(rows)
+
+    def update(self, full: bool = False, using: str = DEFAULT_DB_ALIAS) -> int:
+        """Computes the new or changed buckets, returning how many were saved."""
+        queryset = self.get_queryset().using(using)
+        state, _ = StatisticsWatermark.objects.using(using).get_or_create(
+            rollup=self.name
+        )
+        # Read before the changes, rows added meanwhile go to the next update
+        watermark = queryset.aggregate(value=Max(self.changed_field))["value"]
+        incremental = not full and state.watermark is not None
+        total = 0
+        with transaction.atomic(using=using):
+            for period in self.periods:
+                starts = None
+                if incremental:
+                    changed = queryset.filter(
+                        **{f"{self.changed_field}__gte": state.watermark}
+                    )
+                    starts = set(self._get_bucket_values(changed, period))
+                    if not starts:
+                        continue
+                values = self._get_bucket_values(queryset, period, starts)
+                if not incremental:
+                    StatisticsBucket.objects.using(using).filter(
+                        rollup=self.name, period=period
+                    ).delete()
+                StatisticsBucket.objects.using(using).bulk_create(
+                    [
+                        StatisticsBucket(
+                            rollup=self.name, period=period, start=start, value=value
+                        )
+                        for start, value in values.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["rollup", "period", "start"],
+                    update_fields=["value", "updated_at"],
+                )
+                total += len(values)
+            state.watermark = watermark
+            state.save(using=using)
+        return total
+
+    def _get_buckets(
+        self, period: str, since: Optional[datetime.date], using: str
+    ) -> "models.QuerySet":
+        buckets = StatisticsBucket.objects.using(using).filter(
+            rollup=self.name, period=period
+        )
+        if since is not None:
+            buckets = buckets.filter(start__gte=since)
+        return buckets.order_by("start").values_list("start", "value")
+
+    @staticmethod
+    def _get_series(points: List[Tuple[datetime.date, Any]]) -> Series:
+        max_value = max((value or 0 for _, value in points), default=0)
+        return Series(points, max_value)
+
+    def get_series(
+        self,
+        period: str = "day",
+        since: Optional[datetime.date] = None,
+        using: str = DEFAULT_DB_ALIAS,
+    ) -> Series:
+        """Gets the stored buckets of the period, from the since date if given."""
+        return self._get_series(list(self._get_buckets(period, since, using)))
+
+    async def aget_series(
+        self,
+        period: str = "day",
+        since: Optional[datetime.date] = None,
+        using: str = DEFAULT_DB_ALIAS,
+    ) -> Series:
+        """Async version of get_series."""
+        buckets = self._get_buckets(period, since, using)
+        return self._get_series([point async for point in buckets])
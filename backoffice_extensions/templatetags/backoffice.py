@@ -1,3 +1,4 @@
+import time
 from decimal import Decimal
 from typing import Optional
 
@@ -7,19 +8,16 @@ from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
 from django.db.models import Manager, QuerySet
 from django.db.models.fields.files import FieldFile, ImageFieldFile
 from django.template import defaultfilters
-from django.urls import NoReverseMatch, reverse
+from django.template.base import render_value_in_context
+from django.urls import NoReverseMatch
 from django.utils.safestring import mark_safe
 
+from backoffice_extensions import settings as backoffice_settings
+from backoffice_extensions.fragments import get_cached_rows
 from backoffice_extensions.helpers import StatisticsValue
-from backoffice_extensions.settings import (
-    DETAILS_URLS,
-    NO_IMAGE_VALUE,
-    NONE_VALUE,
-    SIDEBAR_CONFIG,
-    STATUS_FIELDS,
-    STATUS_TAG_CLASSES,
-    URL_NAMESPACE,
-)
+from backoffice_extensions.profiling import get_profile, profile_phase
+from backoffice_extensions.resolvers import get_details_url
+from backoffice_extensions.sidebar import get_sidebar
 
 try:
     from django.contrib.gis.geos import Point
@@ -32,32 +30,20 @@ register = template.Library()
 
 @register.inclusion_tag("backoffice/partials/menu.html", takes_context=True)
 def sidebar_menu(context):
-    """Creates the sidebar data."""
+    """Creates the sidebar data. The structure is cached per user, only the active
+    section is computed in each request."""
     user = context.get("user")
     request = context.get("request")
     active_path = request.get_full_path_info()
-    sidebar = []
-    for group in SIDEBAR_CONFIG:
-        group_label = group.get("label")
-        sections_data = []
-        for section, data in group.get("sections").items():
-            if data.get("permission") is None or (
-                user and user.has_perm(data.get("permission"))
-            ):
-                url = reverse(f"{URL_NAMESPACE}:{section.lower()}-list")
-                active = active_path.startswith(url)
-                sections_data.append(
-                    (
-                        url,
-                        data.get("label"),
-                        active,
-                    )
-                )
-
-        # If the group is empty skip it
-        if sections_data:
-            sidebar.append((group_label, sections_data))
-
+    with profile_phase("sidebar"):
+        sidebar_structure = get_sidebar(user)
+    sidebar = [
+        (
+            group_label,
+            [(url, label, active_path.startswith(url)) for url, label in sections],
+        )
+        for group_label, sections in sidebar_structure
+    ]
     return {"sidebar": sidebar}
 
 
@@ -77,78 +63,129 @@ def boolean_icon(value):
 @register.filter
 def status_tag(value):
     """Gets a status tag with the corresponding class."""
+    status_classes = backoffice_settings.get_settings().STATUS_TAG_CLASSES
+    classes = status_classes.get(value.status, "bg-gray-200")
     result = (
-        '<span class="text-sm text-center rounded px-2 py-1'
-        f' {STATUS_TAG_CLASSES.get(value.status, "bg-gray-200")}">'
+        f'<span class="text-sm text-center rounded px-2 py-1 {classes}">'
         f"{value.get_status_display()}</span>"
     )
     return mark_safe(result)
 
 
+def parse_value(value):
+    """Parse the given value to be shown in the lists and details."""
+    if value is None:
+        value = backoffice_settings.get_settings().NONE_VALUE
+    if isinstance(value, bool):
+        value = boolean_icon(value)
+    if isinstance(value, ImageFieldFile):
+        if value:
+            value = mark_safe(f'<img class="max-w-xs rounded" src="{value.url}" />')
+        else:
+            value = backoffice_settings.get_settings().NO_IMAGE_VALUE
+    if isinstance(value, Manager):
+        if value.exists():
+            tags = "<ul class='list-disc'>"
+            for item in value.all():
+                tags += f"<li>{str(item)}</li>"
+            value = mark_safe(tags + "</ul>")
+        else:
+            value = backoffice_settings.get_settings().NONE_VALUE
+    if Point and isinstance(value, Point):
+        value = f"{value.y},{value.x}"
+    if isinstance(value, FieldFile) and "csv" in value.name:
+        value = mark_safe(
+            f'<a href="{value.url}" type="text/csv" download>{value.name}</a>'
+        )
+    if isinstance(value, Decimal):
+        value = (
+            value.quantize(Decimal(1))
+            if value == value.to_integral()
+            else value.normalize()
+        )
+    return value
+
+
+def details_link(obj, result, follow: bool = True, lookup_field: str = "pk"):
+    """Links the result to the details view of the result (if follow) or the obj,
+    following a DETAILS_URLS rule. The result is returned as is if there is no
+    details view.
+    """
+    lookup_field_value = getattr(result, lookup_field, result)
+    target_model = result if follow else obj
+    try:
+        details_url = get_details_url(
+            f"{backoffice_settings.get_settings().URL_NAMESPACE}:"
+            f"{target_model._meta.model_name}-detail",
+            lookup_field,
+            lookup_field_value,
+        )
+        return mark_safe(f'<a href="{details_url}">{str(result)}</a>')
+    except (NoReverseMatch, AttributeError):
+        return result
+
+
 @register.filter(name="getattr")
 def getattr_filter(obj, name):
     """Calls to getattr over the given obj with the given name."""
-
-    def _parse_value(value):
-        """Parse the given value."""
-        if value is None:
-            value = NONE_VALUE
-        if isinstance(value, bool):
-            value = boolean_icon(value)
-        if isinstance(value, ImageFieldFile):
-            if value:
-                value = mark_safe(f'<img class="max-w-xs rounded" src="{value.url}" />')
-            else:
-                value = NO_IMAGE_VALUE
-        if isinstance(value, Manager):
-            if value.exists():
-                tags = "<ul class='list-disc'>"
-                for item in value.all():
-                    tags += f"<li>{str(item)}</li>"
-                value = mark_safe(tags + "</ul>")
-            else:
-                value = NONE_VALUE
-        if Point and isinstance(value, Point):
-            value = f"{value.y},{value.x}"
-        if isinstance(value, FieldFile) and "csv" in value.name:
-            value = mark_safe(
-                f'<a href="{value.url}" type="text/csv" download>{value.name}</a>'
-            )
-        if isinstance(value, Decimal):
-            value = (
-                value.quantize(Decimal(1))
-                if value == value.to_integral()
-                else value.normalize()
-            )
-        return value
-
     if isinstance(name, tuple) and len(name) > 0:
         name = name[0]
     result = getattr(obj, name)
     if result is None:
         result = "-"
-    for detail_url_data in DETAILS_URLS:
-        names = detail_url_data.get("names", tuple())
-        follow = detail_url_data.get("follow", True)
-        lookup_field = detail_url_data.get("lookup_field") or "pk"
-        lookup_field_value = (
-            getattr(result, lookup_field) if hasattr(result, lookup_field) else result
-        )
-        target_model = result if follow else obj
-        if name in names:
-            try:
-                details_url = reverse(
-                    f"{URL_NAMESPACE}:{target_model._meta.model_name}-detail",
-                    kwargs={lookup_field: lookup_field_value},
-                )
-                result = mark_safe(f'<a href="{details_url}">{str(result)}</a>')
-            except (NoReverseMatch, AttributeError):
-                result = result
-    if name in STATUS_FIELDS:
+    site_settings = backoffice_settings.get_settings()
+    # Only the rules of the name are applied, in the order they are declared
+    for follow, lookup_field in site_settings.details_urls_index.get(name, ()):
+        result = details_link(obj, result, follow, lookup_field)
+    if name in site_settings.STATUS_FIELDS:
         result = status_tag(obj)
     if callable(result) and not isinstance(result, Manager):
         result = result()
-    return _parse_value(result)
+    return parse_value(result)
+
+
+@register.simple_tag(takes_context=True)
+def list_row(context, obj, columns, cached_rows=None):
+    """Renders all the cells of a list row with the precompiled columns, or takes
+    them from the cached_rows if given."""
+    if cached_rows and obj.pk in cached_rows:
+        return mark_safe(cached_rows[obj.pk])
+    profile = get_profile()
+    cells = []
+    for index, column in enumerate(columns):
+        tag = "th" if index == 0 else "td"
+        if profile is None:
+            value = render_value_in_context(column.render(obj), context)
+        else:
+            start = time.perf_counter()
+            value = render_value_in_context(column.render(obj), context)
+            profile.add(f"column:{column.name}", time.perf_counter() - start)
+        cells.append(
+            f'<{tag} class="py-4 text-slate-500 px-6 align-middle whitespace-nowrap">'
+            f"{value}</{tag}>"
+        )
+    return mark_safe("".join(cells))
+
+
+@register.simple_tag(takes_context=True)
+def cached_list_rows(context, objects, columns, version_field=None):
+    """Gets the rendered rows of all the objects of the page by pk, from the cache
+    when their version hasn't changed. The rows are kept apart for each view."""
+    view = context.get("view")
+    with profile_phase("cached_rows"):
+        return get_cached_rows(
+            objects,
+            columns,
+            lambda obj: str(list_row(context, obj, columns)),
+            version_field=version_field,
+            view=f"{view.__module__}.{view.__class__.__qualname__}" if view else "",
+        )
+
+
+@register.simple_tag(takes_context=True)
+def column_value(context, obj, column):
+    """Renders the value of the obj with the precompiled column."""
+    return mark_safe(render_value_in_context(column.render(obj), context))
 
 
 @register.filter
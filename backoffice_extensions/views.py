@@ -1,18 +1,39 @@
-from typing import Dict, List, Optional, Type
+import datetime
+from typing import Any, Dict, List, Optional, Tuple, Type
 
 from django import forms
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db import models
-from django.db.models import ProtectedError
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.paginator import InvalidPage
+from django.db import models, transaction
+from django.db.models import Count, Max, ProtectedError, RestrictedError
+from django.db.models.deletion import Collector
+from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.views import View
 from django.views.generic import ListView
 
-from backoffice_extensions.mixins import BackOfficeViewMixin
-from backoffice_extensions.settings import URL_NAMESPACE
+from backoffice_extensions import settings as backoffice_settings
+from backoffice_extensions.columns import compile_columns
+from backoffice_extensions.exports import DONE, get_job, get_progress
+from backoffice_extensions.forms.imports import ImportFileForm
+from backoffice_extensions.fragments import connect_row_signals, invalidate_rows
+from backoffice_extensions.mixins import (
+    BackOfficeViewMixin,
+    BulkActionMixin,
+    ConditionalGetMixin,
+    ImportMixin,
+)
+from backoffice_extensions.paginators import KeysetPaginator
+from backoffice_extensions.profiling import get_profile, profile_phase
+from backoffice_extensions.queries import optimize_queryset
+from backoffice_extensions.statistics import Rollup, Statistic, get_statistics
 
 User = get_user_model()
 
@@ -49,7 +70,8 @@ class BackOfficeCreateView(BackOfficeFormView):
     def get_redirect_response(self, instance):
         model_class = self.get_model_class()
         return redirect(
-            f"{URL_NAMESPACE}:{model_class._meta.model_name}-detail",
+            f"{backoffice_settings.get_settings().URL_NAMESPACE}:"
+            f"{model_class._meta.model_name}-detail",
             pk=instance.pk,
         )
 
@@ -110,7 +132,9 @@ class BackOfficeEditView(BackOfficeFormView):
     def get_redirect_response(self, instance):
         model_class = self.get_model_class()
         return redirect(
-            f"{URL_NAMESPACE}:{model_class._meta.model_name}-detail", pk=instance.pk
+            f"{backoffice_settings.get_settings().URL_NAMESPACE}:"
+            f"{model_class._meta.model_name}-detail",
+            pk=instance.pk,
         )
 
     def get(self, request, pk, **kwargs):
@@ -160,12 +184,46 @@ class BackOfficeEditView(BackOfficeFormView):
         return render(request, self.template_name, context=context)
 
 
-class BackOfficeListView(LoginRequiredMixin, BackOfficeViewMixin, ListView):
-    """Base view for lists."""
+class BackOfficeListView(
+    LoginRequiredMixin, BackOfficeViewMixin, ConditionalGetMixin, ListView
+):
+    """Base view for lists.
+
+    The relations used in list_display are loaded with select_related and
+    prefetch_related, set optimize_related to False to disable it. Set the
+    paginator_class to KeysetPaginator to paginate with cursors instead of offsets,
+    or to CountlessPaginator, EstimatedCountPaginator or CachedCountPaginator to
+    avoid the exact count of the rows. The paginator_kwargs are passed to the
+    paginator class. The bulk_actions are (url name, label) tuples of views with
+    BulkActionMixin, shown as buttons to apply them to the selected rows.
+
+    Set cache_rows to True to cache the rendered rows. They are invalidated when
+    the objects are saved or deleted (the signals are connected when the view
+    class is defined, if its model or queryset is set), when the values shown in
+    the columns change, and when the value of the version_field (by default
+    modified or updated_at, if the model has them) changes, what also covers the
+    changes made by other processes to the related objects. Without version_field
+    the rows are cached ROW_CACHE_UNVERSIONED_TIMEOUT seconds at most.
+
+    Set conditional_get to True to answer with 304 when the filtered rows didn't
+    change, checked with the count and the latest version_field of the rows.
+    Changes in the related objects shown in the columns are not detected.
+    """
 
     queryset: Optional[models.QuerySet] = None
     list_display: List = []
     filterset_class: Optional[Type] = None
+    optimize_related: bool = True
+    paginator_kwargs: Dict = {}
+    bulk_actions: List[Tuple[str, str]] = []
+    cache_rows: bool = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.cache_rows:
+            model = cls.queryset.model if cls.queryset is not None else cls.model
+            if model is not None:
+                connect_row_signals(model)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -173,27 +231,99 @@ class BackOfficeListView(LoginRequiredMixin, BackOfficeViewMixin, ListView):
 
     def get_queryset(self):
         """Uses the FilterSet class to filter the query."""
-        queryset = super().get_queryset()
+        with profile_phase("queryset"):
+            queryset = super().get_queryset()
         if self.filterset_class:
-            self.filter = self.filterset_class(
-                self.request.GET, queryset=queryset, request=self.request
-            )
-            queryset = self.filter.qs
+            with profile_phase("filter"):
+                self.filter = self.filterset_class(
+                    self.request.GET, queryset=queryset, request=self.request
+                )
+                queryset = self.filter.qs
+        if self.optimize_related:
+            queryset = optimize_queryset(queryset, self.list_display)
         return queryset
 
+    def get_version(self) -> Optional[Tuple[str, None]]:
+        """Gets the count and the latest version of the filtered rows."""
+        queryset = self.get_queryset()
+        version_field = self.get_version_field(queryset.model)
+        if version_field is None:
+            return None
+        values = queryset.order_by().aggregate(
+            version=Max(version_field), count=Count("pk")
+        )
+        return f"{values['version']}:{values['count']}", None
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        kwargs = {**self.paginator_kwargs, **kwargs}
+        paginator = super().get_paginator(queryset, per_page, **kwargs)
+        # Counts apart when profiling, except for the paginators without count
+        if get_profile() is not None and getattr(paginator, "uses_count", True):
+            with profile_phase("count"):
+                paginator.count
+        return paginator
+
+    def paginate_queryset(self, queryset, page_size):
+        """Uses the page_kwarg as the cursor for the keyset paginators. The rows of
+        the page are fetched here, so they can be timed apart from the render."""
+        if not issubclass(self.paginator_class, KeysetPaginator):
+            with profile_phase("page"):
+                paginator, page, object_list, is_paginated = super().paginate_queryset(
+                    queryset, page_size
+                )
+                len(page)
+            return paginator, page, object_list, is_paginated
+        paginator = self.get_paginator(
+            queryset,
+            page_size,
+            orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty(),
+        )
+        try:
+            with profile_phase("page"):
+                page = paginator.page(self.request.GET.get(self.page_kwarg))
+        except InvalidPage as error:
+            raise Http404(_("Invalid page: %(message)s") % {"message": str(error)})
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_columns(self):
+        """Gets the columns of the list_display, with their precompiled renderers."""
+        return compile_columns(self.object_list.model, self.list_display)
+
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(object_list=object_list, **kwargs)
-        context.update({"list_display": self.list_display, "filter": self.filter})
+        context.update(
+            {
+                "list_display": self.list_display,
+                "columns": self.get_columns(),
+                "filter": self.filter,
+                "bulk_actions": self.bulk_actions,
+                "cache_rows": self.cache_rows,
+            }
+        )
+        if self.cache_rows:
+            model = self.object_list.model
+            connect_row_signals(model)
+            context["version_field"] = self.get_version_field(model)
         context.update(self.get_extra_context())
         return context
 
 
-class BackOfficeDetailView(LoginRequiredMixin, BackOfficeViewMixin, View):
-    """Base detail view."""
+class BackOfficeDetailView(
+    LoginRequiredMixin, BackOfficeViewMixin, ConditionalGetMixin, View
+):
+    """Base detail view.
+
+    The relations used in fields are loaded with select_related and
+    prefetch_related, set optimize_related to False to disable it. Set
+    conditional_get to True to answer with 304 when the version_field of the
+    object didn't change.
+    """
 
     queryset: Optional[models.QuerySet] = None
     model_class: Type[models.Model] = models.Model
     fields: List = []
+    optimize_related: bool = True
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -203,18 +333,54 @@ class BackOfficeDetailView(LoginRequiredMixin, BackOfficeViewMixin, View):
         """Gets the queryset in order to be able to access to annotated fields."""
         return self.queryset
 
+    def _get_base_queryset(self) -> models.QuerySet:
+        queryset = self.get_queryset()
+        if queryset is None:
+            queryset = self.model_class._default_manager.all()
+        return queryset
+
     def get_object(self, pk: int) -> models.Model:
         """Gets the object, using the queryset if provided to add annotation fields."""
-        queryset = self.get_queryset()
-        if queryset:
-            return get_object_or_404(queryset, pk=pk)
-        return get_object_or_404(self.model_class, pk=pk)
+        queryset = self._get_base_queryset()
+        if self.optimize_related:
+            queryset = optimize_queryset(queryset, self.fields)
+        return get_object_or_404(queryset, pk=pk)
+
+    def get_version(self) -> Optional[Tuple[Any, Optional[datetime.datetime]]]:
+        """Gets the version_field of the object, without loading it."""
+        queryset = self._get_base_queryset()
+        version_field = self.get_version_field(queryset.model)
+        if version_field is None:
+            return None
+        version = (
+            queryset.filter(pk=self.kwargs["pk"])
+            .values_list(version_field, flat=True)
+            .first()
+        )
+        if version is None:
+            return None
+        modified = version if isinstance(version, datetime.datetime) else None
+        return version, modified
 
-    def get(self, request, pk):
-        self.instance = self.get_object(pk=pk)
-        context = {"instance": self.instance, "fields": self.fields}
+    def get_columns(self):
+        """Gets the columns of the fields, with their precompiled renderers."""
+        return compile_columns(self.instance.__class__, self.fields)
+
+    def get_context_data(self) -> Dict:
+        context = {
+            "instance": self.instance,
+            "fields": self.fields,
+            "columns": self.get_columns(),
+        }
         context.update(self.get_extra_context())
-        return render(request, self.template_name, context=context)
+        return context
+
+    def get(self, request, pk):
+        with profile_phase("object"):
+            self.instance = self.get_object(pk=pk)
+        context = self.get_context_data()
+        with profile_phase("render"):
+            return render(request, self.template_name, context=context)
 
 
 class BackOfficeDeleteView(LoginRequiredMixin, BackOfficeViewMixin, View):
@@ -231,7 +397,10 @@ class BackOfficeDeleteView(LoginRequiredMixin, BackOfficeViewMixin, View):
         return self.queryset
 
     def get_redirect_response(self):
-        return redirect(f"{URL_NAMESPACE}:{self.model_class._meta.model_name}-list")
+        return redirect(
+            f"{backoffice_settings.get_settings().URL_NAMESPACE}:"
+            f"{self.model_class._meta.model_name}-list"
+        )
 
     def perform_delete(self, instance):
         """Overwrite to handle the deletion. By default, it uses model delete."""
@@ -260,11 +429,315 @@ class BackOfficeDeleteView(LoginRequiredMixin, BackOfficeViewMixin, View):
         return self.get_redirect_response()
 
 
+class BackOfficeBulkDeleteView(
+    LoginRequiredMixin, BulkActionMixin, BackOfficeViewMixin, View
+):
+    """Deletes the selected rows of a list, in transactions of chunk_size rows.
+    The chunks are deleted with a single query when the model has no signals nor
+    cascades, and the protected or restricted rows are reported without stopping
+    the rest.
+    """
+
+    uses_template = False
+    http_method_names = ["post"]
+    success_message = _("{count} {name} deleted")
+    protected_error_message = _("{count} {name} can't be deleted: {instances}")
+
+    def delete_chunk(self, queryset: models.QuerySet) -> Tuple[int, List]:
+        """Deletes the rows of the queryset, returning the number of deleted rows
+        and the protected or restricted instances."""
+        using = queryset.db
+        label = queryset.model._meta.label
+        try:
+            with transaction.atomic(using=using):
+                if Collector(using=using).can_fast_delete(queryset):
+                    return queryset._raw_delete(using), []
+                _, deleted = queryset.delete()
+                return deleted.get(label, 0), []
+        except (ProtectedError, RestrictedError):
+            pass
+        # Deletes one by one to find the protected rows
+        count, protected = 0, []
+        for instance in queryset:
+            try:
+                with transaction.atomic(using=using):
+                    instance.delete()
+                count += 1
+            except (ProtectedError, RestrictedError):
+                protected.append(instance)
+        return count, protected
+
+    def post(self, request, **kwargs):
+        count, protected = 0, []
+        queryset = self.get_selected_queryset()
+        for chunk in self.iter_chunks(queryset):
+            deleted, chunk_protected = self.delete_chunk(chunk)
+            count += deleted
+            protected += chunk_protected
+        options = queryset.model._meta
+        if count:
+            messages.success(
+                request,
+                self.success_message.format(
+                    count=count,
+                    name=options.verbose_name
+                    if count == 1
+                    else options.verbose_name_plural,
+                ),
+            )
+        if protected:
+            messages.error(
+                request,
+                self.protected_error_message.format(
+                    count=len(protected),
+                    name=options.verbose_name_plural,
+                    instances=", ".join(str(instance) for instance in protected[:10]),
+                ),
+            )
+        return self.get_redirect_response()
+
+
+class BackOfficeBulkUpdateView(
+    LoginRequiredMixin, BulkActionMixin, BackOfficeViewMixin, View
+):
+    """Sets the same values in the selected rows of a list. The first post, from
+    the list, shows the form with the fields to change, that is validated once.
+    The values are then set with an UPDATE query per chunk of chunk_size rows.
+
+    The form is the form_class, or a ModelForm with the given fields. Set
+    row_values to True to compute different values per row in get_row_values,
+    they are saved with bulk_update, that updates every field returned for any
+    of the rows. Set use_save to True for the models that
+    need their save method or its signals; the rows are saved one by one, as
+    when the form has many to many fields.
+    """
+
+    template_name = "backoffice/bases/bulk_update.html"
+    http_method_names = ["post"]
+    form_class: Optional[Type[forms.ModelForm]] = None
+    fields: List[str] = []
+    apply_param: str = "apply"
+    row_values: bool = False
+    use_save: bool = False
+    success_message = _("{count} {name} updated")
+
+    def get_model_class(self) -> Type[models.Model]:
+        """Gets the model of the queryset."""
+        return self.get_queryset().model
+
+    def get_form_class(self) -> Type[forms.ModelForm]:
+        if self.form_class is not None:
+            return self.form_class
+        return forms.modelform_factory(self.get_model_class(), fields=self.fields)
+
+    def get_update_values(self, form: forms.ModelForm) -> Dict:
+        """Gets the values of the model fields of the form."""
+        names = {
+            field.name
+            for field in self.get_model_class()._meta.get_fields()
+            if field.concrete
+        }
+        return {
+            name: value for name, value in form.cleaned_data.items() if name in names
+        }
+
+    def get_row_values(self, instance: models.Model, values: Dict) -> Dict:
+        """Gets the values of the row, used if row_values is True."""
+        return values
+
+    def get_auto_now_values(self) -> Dict:
+        """Gets the values of the auto_now fields, that an UPDATE doesn't set."""
+        instance = self.get_model_class()()
+        return {
+            field.attname: field.pre_save(instance, add=False)
+            for field in instance._meta.concrete_fields
+            if getattr(field, "auto_now", False)
+        }
+
+    def save_chunk(self, queryset: models.QuerySet, values: Dict) -> int:
+        """Sets the values to the rows one by one, with their save method."""
+        count = 0
+        for instance in queryset:
+            related = {}
+            for name, value in self.get_row_values(instance, values).items():
+                if instance._meta.get_field(name).many_to_many:
+                    related[name] = value
+                else:
+                    setattr(instance, name, value)
+            instance.save()
+            for name, value in related.items():
+                getattr(instance, name).set(value)
+            count += 1
+        return count
+
+    def update_chunk(self, queryset: models.QuerySet, values: Dict) -> int:
+        """Sets the values to the rows of the queryset, returning their number."""
+        with transaction.atomic(using=queryset.db):
+            if self.use_save or any(
+                queryset.model._meta.get_field(name).many_to_many for name in values
+            ):
+                return self.save_chunk(queryset, values)
+            auto_now_values = self.get_auto_now_values()
+            if self.row_values:
+                instances = list(queryset)
+                # The fields returned for any of the rows, in order
+                fields = dict.fromkeys(auto_now_values)
+                for instance in instances:
+                    row_values = self.get_row_values(instance, values)
+                    fields.update(dict.fromkeys(row_values))
+                    for name, value in {**row_values, **auto_now_values}.items():
+                        setattr(instance, name, value)
+                if instances and fields:
+                    queryset.model._default_manager.bulk_update(instances, list(fields))
+                count = len(instances)
+            else:
+                count = queryset.update(**values, **auto_now_values)
+            invalidate_rows(queryset)
+        return count
+
+    def post(self, request, **kwargs):
+        queryset = self.get_selected_queryset()
+        form_class = self.get_form_class()
+        if request.POST.get(self.apply_param):
+            form = form_class(data=request.POST, files=request.FILES)
+            if form.is_valid():
+                values = self.get_update_values(form)
+                count = sum(
+                    self.update_chunk(chunk, values)
+                    for chunk in self.iter_chunks(queryset)
+                )
+                options = queryset.model._meta
+                messages.success(
+                    request,
+                    self.success_message.format(
+                        count=count,
+                        name=options.verbose_name
+                        if count == 1
+                        else options.verbose_name_plural,
+                    ),
+                )
+                return self.get_redirect_response()
+        else:
+            form = form_class()
+        context = {
+            "form": form,
+            "count": queryset.count(),
+            "selection": request.POST.getlist(self.selection_param),
+            "select_across": request.POST.get(self.select_across_param),
+            "selection_param": self.selection_param,
+            "select_across_param": self.select_across_param,
+            "apply_param": self.apply_param,
+        }
+        context.update(self.get_extra_context())
+        return render(request, self.template_name, context=context)
+
+
+class BackOfficeImportView(LoginRequiredMixin, ImportMixin, BackOfficeViewMixin, View):
+    """Imports the rows of an uploaded file with the form_class (see ImportMixin),
+    showing the result and the first errors, with the link to the report."""
+
+    template_name = "backoffice/bases/import.html"
+    upload_form_class: Type[forms.Form] = ImportFileForm
+    download_url_name: Optional[str] = None  # <namespace>:export-download
+    success_message = _("{count} {name} imported")
+
+    def get_download_url_name(self) -> str:
+        return (
+            self.download_url_name
+            or f"{backoffice_settings.get_settings().URL_NAMESPACE}:export-download"
+        )
+
+    def get_context_data(self, **kwargs) -> Dict:
+        context = {"model_name": self.form_class._meta.model._meta.verbose_name_plural}
+        context.update(kwargs)
+        context.update(self.get_extra_context())
+        return context
+
+    def get(self, request, **kwargs):
+        context = self.get_context_data(form=self.upload_form_class())
+        return render(request, self.template_name, context=context)
+
+    def post(self, request, **kwargs):
+        form = self.upload_form_class(request.POST, request.FILES)
+        result, report_url, dry_run = None, None, False
+        if form.is_valid():
+            dry_run = form.cleaned_data["dry_run"]
+            try:
+                result = self.import_file(form.cleaned_data["file"], dry_run=dry_run)
+            except ValidationError as error:
+                form.add_error("file", error)
+        if result is not None and result.report is not None:
+            report_url = reverse(
+                self.get_download_url_name(), kwargs={"job_id": result.report["id"]}
+            )
+        if result is not None and result.imported and not dry_run:
+            options = self.form_class._meta.model._meta
+            messages.success(
+                request,
+                self.success_message.format(
+                    count=result.imported,
+                    name=options.verbose_name
+                    if result.imported == 1
+                    else options.verbose_name_plural,
+                ),
+            )
+        context = self.get_context_data(form=form, result=result, report_url=report_url)
+        return render(request, self.template_name, context=context)
+
+
+class BackOfficeExportStatusView(LoginRequiredMixin, View):
+    """Returns the progress of a background export as JSON, with the download
+    URL once it's done. Only the user that started the export can see it.
+    """
+
+    download_url_name: Optional[str] = None  # <namespace>:export-download
+
+    def get_download_url_name(self) -> str:
+        return (
+            self.download_url_name
+            or f"{backoffice_settings.get_settings().URL_NAMESPACE}:export-download"
+        )
+
+    def get_job(self, job_id: str) -> Dict:
+        job = get_job(job_id)
+        if job is None or job["user"] != self.request.user.pk:
+            raise Http404
+        return job
+
+    def get(self, request, job_id, **kwargs):
+        job = self.get_job(job_id)
+        data = get_progress(job)
+        data["download_url"] = None
+        if job["status"] == DONE:
+            data["download_url"] = reverse(
+                self.get_download_url_name(), kwargs={"job_id": job_id}
+            )
+        return JsonResponse(data)
+
+
+class BackOfficeExportDownloadView(BackOfficeExportStatusView):
+    """Sends the file of a finished background export."""
+
+    def get(self, request, job_id, **kwargs):
+        job = self.get_job(job_id)
+        if job["status"] != DONE or not default_storage.exists(job["path"]):
+            raise Http404
+        return FileResponse(
+            default_storage.open(job["path"]),
+            as_attachment=True,
+            filename=job["filename"],
+        )
+
+
 class BackOfficeIndexView(BackOfficeViewMixin, View):
     """Home view of the backoffice_extensions."""
 
     template_name = "backoffice/index.html"
-    sign_in_redirect: str = f"{URL_NAMESPACE}:sign-in"
+    sign_in_redirect: Optional[str] = None  # <namespace>:sign-in
+    statistics: Dict[str, Statistic] = {}
+    rollups: Dict[str, Rollup] = {}
+    rollup_period: str = "day"
+    rollup_days: int = 30
 
     @staticmethod
     def default_queryset() -> Dict:
@@ -275,9 +748,35 @@ class BackOfficeIndexView(BackOfficeViewMixin, View):
         """Overwrite to add context to the view."""
         return {}
 
+    def get_sign_in_redirect(self) -> str:
+        return (
+            self.sign_in_redirect
+            or f"{backoffice_settings.get_settings().URL_NAMESPACE}:sign-in"
+        )
+
+    def get_statistics(self) -> Dict:
+        """Gets the values of the declared statistics, by label."""
+        return get_statistics(self.statistics)
+
+    def get_series_since(self) -> datetime.date:
+        return timezone.localdate() - datetime.timedelta(days=self.rollup_days)
+
+    def get_series(self) -> Dict:
+        """Gets the stored series of the declared rollups, by label, for the last
+        rollup_days days."""
+        since = self.get_series_since()
+        return {
+            label: rollup.get_series(self.rollup_period, since=since)
+            for label, rollup in self.rollups.items()
+        }
+
     def get(self, request, **kwargs):
         if not request.user.is_authenticated:
-            return redirect(self.sign_in_redirect)
+            return redirect(self.get_sign_in_redirect())
         context = self.get_context_data()
+        if self.statistics and "statistics" not in context:
+            context["statistics"] = self.get_statistics()
+        if self.rollups and "series" not in context:
+            context["series"] = self.get_series()
         context.update(self.get_extra_context())
         return render(request, self.template_name, context=context)
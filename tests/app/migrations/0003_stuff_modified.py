@@ -0,0 +1,18 @@
+from django.db import migrations, models
+from django.utils import timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0002_alter_stuff_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stuff",
+            name="modified",
+            field=models.DateTimeField(auto_now=True, default=timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -11,6 +11,7 @@ class Stuff(models.Model):
 
     status = models.CharField(default=IDLE, max_length=32, choices=STATUS_CHOICES)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    modified = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["id"]
@@ -1,6 +1,8 @@
 from django.urls import path
 
 from tests.backoffice.stuffs.views import (
+    StuffBulkDeleteView,
+    StuffBulkUpdateView,
     StuffDeleteView,
     StuffDetailView,
     StuffListView,
@@ -9,5 +11,7 @@ from tests.backoffice.stuffs.views import (
 urlpatterns = [
     path("<int:pk>/delete/", StuffDeleteView.as_view(), name="stuff-delete"),
     path("<int:pk>/", StuffDetailView.as_view(), name="stuff-detail"),
+    path("update/", StuffBulkUpdateView.as_view(), name="stuff-bulk-update"),
+    path("delete/", StuffBulkDeleteView.as_view(), name="stuff-bulk-delete"),
     path("", StuffListView.as_view(), name="stuff-list"),
 ]
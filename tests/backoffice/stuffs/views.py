@@ -1,4 +1,6 @@
 from backoffice_extensions.views import (
+    BackOfficeBulkDeleteView,
+    BackOfficeBulkUpdateView,
     BackOfficeDeleteView,
     BackOfficeDetailView,
     BackOfficeListView,
@@ -11,6 +13,10 @@ class StuffListView(BackOfficeListView):
     queryset = Stuff.objects.all()
     paginate_by = 15
     list_display = ["id", "status", "owner"]
+    bulk_actions = [
+        ("backoffice:stuff-bulk-update", "Change status"),
+        ("backoffice:stuff-bulk-delete", "Delete"),
+    ]
 
 
 class StuffDetailView(BackOfficeDetailView):
@@ -24,3 +30,13 @@ class StuffDetailView(BackOfficeDetailView):
 class StuffDeleteView(BackOfficeDeleteView):
     model_class = Stuff
     queryset = StuffListView.queryset
+
+
+class StuffBulkDeleteView(BackOfficeBulkDeleteView):
+    queryset = StuffListView.queryset
+
+
+class StuffBulkUpdateView(BackOfficeBulkUpdateView):
+    queryset = StuffListView.queryset
+    fields = ["status"]
+    chunk_size = 2
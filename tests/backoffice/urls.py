@@ -1,11 +1,26 @@
 from django.urls import include, path
 
-from tests.backoffice.views import IndexView
+from backoffice_extensions.views import (
+    BackOfficeExportDownloadView,
+    BackOfficeExportStatusView,
+)
+from tests.backoffice.views import AsyncIndexView, IndexView
 
 app_name = "backoffice"
 urlpatterns = [
     path("stuffs/", include("tests.backoffice.stuffs.urls")),
     path("users/", include("tests.backoffice.users.urls")),
     path("auth/", include("tests.backoffice.auth.urls")),
+    path(
+        "exports/<str:job_id>/",
+        BackOfficeExportStatusView.as_view(),
+        name="export-status",
+    ),
+    path(
+        "exports/<str:job_id>/download/",
+        BackOfficeExportDownloadView.as_view(),
+        name="export-download",
+    ),
+    path("async/", AsyncIndexView.as_view(), name="index-async"),
     path("", IndexView.as_view(), name="index"),
 ]
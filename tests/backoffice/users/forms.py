@@ -22,3 +22,8 @@ class CreationUserForm(UserForm):
             list(UserForm.Meta.widgets.items())
             + list({"password": forms.PasswordInput(attrs={"class": "input"})}.items())
         )
+
+
+class UserGroupsForm(UserForm):
+    class Meta(UserForm.Meta):
+        fields = UserForm.Meta.fields + ["groups"]
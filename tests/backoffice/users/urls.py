@@ -1,19 +1,66 @@
-from django.urls import path
+from django.urls import path, re_path
 
 from tests.backoffice.users.views import (
+    AsyncExportUsersView,
+    AsyncUserDetailView,
+    AsyncUserListView,
+    BackgroundExportUsersView,
+    CountlessUserListView,
     ExportUsersView,
+    FullTextUserListView,
+    GroupBackgroundExportUsersView,
+    GroupsExportUsersView,
+    KeysetUserListView,
+    StreamingExportUsersView,
+    UserBulkDeleteView,
     UserCreateView,
     UserDeleteView,
     UserDetailView,
     UserEditView,
+    UserImportView,
     UserListView,
+    UserUpsertView,
 )
 
 urlpatterns = [
     path("<int:pk>/delete/", UserDeleteView.as_view(), name="user-delete"),
     path("<int:pk>/edit/", UserEditView.as_view(), name="user-edit"),
     path("<int:pk>/", UserDetailView.as_view(), name="user-detail"),
+    re_path(
+        r"^short/(?P<pk>[0-9]{1,6})/$",
+        UserDetailView.as_view(),
+        name="user-detail-short",
+    ),
     path("create/", UserCreateView.as_view(), name="user-create"),
+    path("delete/", UserBulkDeleteView.as_view(), name="user-bulk-delete"),
     path("export/", ExportUsersView.as_view(), name="user-export"),
+    path(
+        "export/stream/",
+        StreamingExportUsersView.as_view(),
+        name="user-export-stream",
+    ),
+    path(
+        "export/groups/",
+        GroupsExportUsersView.as_view(),
+        name="user-export-groups",
+    ),
+    path(
+        "export/background/",
+        BackgroundExportUsersView.as_view(),
+        name="user-export-background",
+    ),
+    path(
+        "export/background/<int:group_pk>/",
+        GroupBackgroundExportUsersView.as_view(),
+        name="user-export-background-group",
+    ),
+    path("async/<int:pk>/", AsyncUserDetailView.as_view(), name="user-detail-async"),
+    path("async/export/", AsyncExportUsersView.as_view(), name="user-export-async"),
+    path("async/", AsyncUserListView.as_view(), name="user-list-async"),
+    path("import/", UserImportView.as_view(), name="user-import"),
+    path("import/upsert/", UserUpsertView.as_view(), name="user-import-upsert"),
+    path("keyset/", KeysetUserListView.as_view(), name="user-list-keyset"),
+    path("search/", FullTextUserListView.as_view(), name="user-list-search"),
+    path("countless/", CountlessUserListView.as_view(), name="user-list-countless"),
     path("", UserListView.as_view(), name="user-list"),
 ]
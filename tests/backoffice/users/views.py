@@ -2,15 +2,27 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views import View
 
-from backoffice_extensions.mixins import ExportMixin, SearchListMixin
+from backoffice_extensions.async_views import (
+    AsyncBackOfficeDetailView,
+    AsyncBackOfficeListView,
+)
+from backoffice_extensions.mixins import (
+    AsyncBackOfficeViewMixin,
+    ExportMixin,
+    SearchListMixin,
+)
+from backoffice_extensions.paginators import CountlessPaginator, KeysetPaginator
+from backoffice_extensions.search import SQLiteFTS5SearchBackend
 from backoffice_extensions.views import (
+    BackOfficeBulkDeleteView,
     BackOfficeCreateView,
     BackOfficeDeleteView,
     BackOfficeDetailView,
     BackOfficeEditView,
+    BackOfficeImportView,
     BackOfficeListView,
 )
-from tests.backoffice.users.forms import CreationUserForm, UserForm
+from tests.backoffice.users.forms import CreationUserForm, UserForm, UserGroupsForm
 
 User = get_user_model()
 
@@ -28,6 +40,20 @@ class UserListView(SearchListMixin, BackOfficeListView):
     list_display = ["id", "first_name", "last_name", "username", "date_joined"]
 
 
+class KeysetUserListView(UserListView):
+    paginator_class = KeysetPaginator
+    paginate_by = 5
+
+
+class CountlessUserListView(UserListView):
+    paginator_class = CountlessPaginator
+    paginate_by = 5
+
+
+class FullTextUserListView(UserListView):
+    search_backend_class = SQLiteFTS5SearchBackend
+
+
 class UserCreateView(BackOfficeCreateView):
     template_name = "backoffice/users/create.html"
     form_class = CreationUserForm
@@ -62,3 +88,58 @@ class ExportUsersView(LoginRequiredMixin, ExportMixin, View):
     filename = "users.csv"
     queryset = UserListView.queryset
     fields = UserDetailView.fields
+
+
+class StreamingExportUsersView(ExportUsersView):
+    streaming = True
+
+
+class GroupsExportUsersView(ExportUsersView):
+    fields = ExportUsersView.fields + ["groups"]
+    optimize_related = False
+    chunk_size = 10
+
+
+class BackgroundExportUsersView(ExportUsersView):
+    background = True
+
+
+class GroupBackgroundExportUsersView(BackgroundExportUsersView):
+    def get_queryset(self):
+        return super().get_queryset().filter(groups__pk=self.kwargs["group_pk"])
+
+
+class UserBulkDeleteView(SearchListMixin, BackOfficeBulkDeleteView):
+    queryset = UserListView.queryset
+    search_fields = UserListView.search_fields
+    chunk_size = 2
+
+
+class AsyncUserListView(SearchListMixin, AsyncBackOfficeListView):
+    template_name = UserListView.template_name
+    queryset = UserListView.queryset
+    context_object_name = UserListView.context_object_name
+    search_fields = UserListView.search_fields
+    paginate_by = UserListView.paginate_by
+    list_display = UserListView.list_display
+
+
+class AsyncUserDetailView(AsyncBackOfficeDetailView):
+    template_name = UserDetailView.template_name
+    queryset = UserListView.queryset
+    model_class = User
+    fields = UserDetailView.fields
+
+
+class AsyncExportUsersView(AsyncBackOfficeViewMixin, ExportUsersView):
+    pass
+
+
+class UserImportView(BackOfficeImportView):
+    form_class = UserForm
+    batch_size = 2
+
+
+class UserUpsertView(UserImportView):
+    form_class = UserGroupsForm
+    unique_fields = ["username"]
@@ -1,5 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max, Q
+
+from backoffice_extensions.async_views import AsyncBackOfficeIndexView
+from backoffice_extensions.statistics import Rollup, Statistic
 from backoffice_extensions.views import BackOfficeIndexView
+from tests.app.models import Stuff
+
+User = get_user_model()
 
 
 class IndexView(BackOfficeIndexView):
-    pass
+    statistics = {
+        "Users": Statistic(User.objects.all(), Count("id")),
+        "Staff users": Statistic(
+            User.objects.all(), Count("id", filter=Q(is_staff=True))
+        ),
+        "Last sign up": Statistic(User.objects.all(), Max("date_joined")),
+        "Stuffs": Statistic(
+            lambda: Stuff.objects.all(), Count("id"), ttl=0, stale_ttl=60
+        ),
+    }
+    rollups = {
+        "Sign ups": Rollup(
+            "signups",
+            User.objects.all(),
+            "date_joined",
+            Count("id"),
+            periods=("day", "week"),
+        ),
+    }
+
+
+class AsyncIndexView(AsyncBackOfficeIndexView):
+    statistics = IndexView.statistics
+    rollups = IndexView.rollups
@@ -0,0 +1,35 @@
+"""Compares two benchmark result files:
+
+    python -m tests.benchmarks.compare base.json head.json
+"""
+import json
+import sys
+from typing import Dict, List
+
+
+def compare(base: Dict, head: Dict) -> List[str]:
+    """Formats the change of each benchmark between two result files."""
+    base_results = {(item["name"], item["size"]): item for item in base["results"]}
+    lines = [f"{base['commit']} -> {head['commit']}"]
+    for item in head["results"]:
+        previous = base_results.get((item["name"], item["size"]))
+        if previous is None:
+            lines.append(f"{item['name']} [{item['size']}]: new")
+            continue
+        ratio = (
+            item["median_ms"] / previous["median_ms"] if previous["median_ms"] else 0
+        )
+        lines.append(
+            f"{item['name']} [{item['size']}]: "
+            f"{previous['median_ms']} -> {item['median_ms']} ms ({ratio:.2f}x), "
+            f"{previous['queries']} -> {item['queries']} queries, "
+            f"{previous['peak_memory_kb']} -> {item['peak_memory_kb']} KB"
+        )
+    return lines
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    with open(sys.argv[1]) as base, open(sys.argv[2]) as head:
+        print("\n".join(compare(json.load(base), json.load(head))))
@@ -0,0 +1,112 @@
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import django
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from tests.app.constants import ACTIVE, ERROR, IDLE
+from tests.app.models import Stuff
+
+User = get_user_model()
+
+STATUSES = (IDLE, ACTIVE, ERROR)
+
+
+def seed(size: int, batch_size: int = 10000):
+    """Creates size users and size stuffs, owned by the users in turns. The users
+    have an unusable password, so no hashing is done."""
+    now = timezone.now()
+    for start in range(0, size, batch_size):
+        end = min(start + batch_size, size)
+        User.objects.bulk_create(
+            User(
+                username=f"user{index}@example.com",
+                email=f"user{index}@example.com",
+                first_name=f"First {index % 1000}",
+                last_name=f"Last {index % 997}",
+                password="!",
+                date_joined=now - datetime.timedelta(minutes=index),
+            )
+            for index in range(start, end)
+        )
+    first_pk = User.objects.order_by("pk").values_list("pk", flat=True).first()
+    for start in range(0, size, batch_size):
+        end = min(start + batch_size, size)
+        Stuff.objects.bulk_create(
+            Stuff(owner_id=first_pk + index % size, status=STATUSES[index % 3])
+            for index in range(start, end)
+        )
+
+
+def consume(response) -> int:
+    """Reads the whole response, returning its length."""
+    if getattr(response, "streaming", False):
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def measure(name: str, size: int, function: Callable, repeat: int = 5) -> Dict:
+    """Runs the function once to warm up and repeat times to get the latency.
+    The queries are counted in the first of those runs, and the peak memory is
+    measured in an extra run, as tracing the allocations slows down the code.
+    """
+    function()
+    durations = []
+    queries = 0
+    for index in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            function()
+            durations.append(time.perf_counter() - start)
+        if index == 0:
+            queries = len(context.captured_queries)
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "name": name,
+        "size": size,
+        "median_ms": round(statistics.median(durations) * 1000, 3),
+        "min_ms": round(min(durations) * 1000, 3),
+        "queries": queries,
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path: str, results: List[Dict]):
+    """Writes the results with the environment they were taken in."""
+    data = {
+        "commit": get_commit(),
+        "created_at": timezone.now().isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "results": results,
+    }
+    with open(path, "w") as stream:
+        json.dump(data, stream, indent=2)
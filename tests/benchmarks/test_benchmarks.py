@@ -0,0 +1,145 @@
+"""Benchmarks of the views and template tags with realistic data sizes. They are
+skipped unless BACKOFFICE_BENCHMARK is set:
+
+    BACKOFFICE_BENCHMARK=1 BACKOFFICE_BENCHMARK_SIZES=10000,100000 pytest tests/benchmarks
+
+The results are written as JSON to BACKOFFICE_BENCHMARK_OUTPUT (benchmark.json by
+default), to be compared with tests.benchmarks.compare.
+"""
+import os
+import unittest
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, override_settings
+from test_plus import TestCase
+
+from backoffice_extensions.settings import DEFAULTS
+from backoffice_extensions.templatetags.backoffice import getattr_filter
+from tests.app.models import Stuff
+from tests.backoffice.users.views import UserImportView, UserListView
+from tests.benchmarks.harness import User, consume, measure, seed, write_results
+
+ENABLED = bool(os.environ.get("BACKOFFICE_BENCHMARK"))
+SIZES = [
+    int(size)
+    for size in os.environ.get("BACKOFFICE_BENCHMARK_SIZES", "10000").split(",")
+]
+OUTPUT = os.environ.get("BACKOFFICE_BENCHMARK_OUTPUT", "benchmark.json")
+REPEAT = int(os.environ.get("BACKOFFICE_BENCHMARK_REPEAT", "5"))
+DEFAULT_DETAILS_URLS = DEFAULTS["DETAILS_URLS"]
+
+results: List[Dict] = []
+
+
+def tearDownModule():
+    if results:
+        write_results(OUTPUT, results)
+
+
+@unittest.skipUnless(ENABLED, "Set BACKOFFICE_BENCHMARK to run the benchmarks.")
+class BenchmarkTestCase(TestCase):
+    size: int = 0
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(cls.size)
+        cls.user = User.objects.create_superuser("admin", password="password")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def benchmark(self, name: str, url_name: str, *args, **kwargs):
+        url = self.reverse(url_name, *args)
+
+        def request():
+            response = self.client.get(url, data=kwargs)
+            self.assertEqual(200, response.status_code)
+            consume(response)
+
+        results.append(measure(name, self.size, request, repeat=REPEAT))
+
+    def test_user_list(self):
+        last_page = self.size // UserListView.paginate_by
+        self.benchmark("user-list", "backoffice:user-list")
+        self.benchmark("user-list-search", "backoffice:user-list", search="First 5")
+        self.benchmark("user-list-deep", "backoffice:user-list", page=last_page)
+        self.benchmark("user-list-countless", "backoffice:user-list-countless")
+        self.benchmark("stuff-list", "backoffice:stuff-list")
+
+    def test_export(self):
+        self.benchmark("user-export", "backoffice:user-export")
+        self.benchmark("user-export-stream", "backoffice:user-export-stream")
+
+    def test_detail(self):
+        user = User.objects.order_by("pk").last()
+        stuff = Stuff.objects.order_by("pk").last()
+        self.benchmark("user-detail", "backoffice:user-detail", user.pk)
+        self.benchmark("stuff-detail", "backoffice:stuff-detail", stuff.pk)
+
+    def test_index(self):
+        self.benchmark("index", "backoffice:index")
+
+    def test_import(self):
+        # measure runs the import repeat + 2 times, each one with new usernames
+        files = iter(
+            SimpleUploadedFile(
+                "users.csv",
+                (
+                    "username,first_name,last_name\n"
+                    + "".join(
+                        f"import{run}-{index},First,Last\n"
+                        for index in range(self.size)
+                    )
+                ).encode(),
+            )
+            for run in range(REPEAT + 2)
+        )
+        request = RequestFactory().post("/")
+        request.user = self.user
+        view = UserImportView(batch_size=1000)
+        view.setup(request)
+
+        def run():
+            result = view.import_file(next(files))
+            self.assertEqual(self.size, result.imported)
+
+        results.append(measure("user-import", self.size, run, repeat=REPEAT))
+
+    def test_getattr_filter(self):
+        stuffs = list(Stuff.objects.select_related("owner")[:1000])
+        users = list(User.objects.all()[:1000])
+        cells = len(stuffs) * 3 + len(users) * len(UserListView.list_display)
+
+        def render():
+            for stuff in stuffs:
+                for field in ("id", "status", "owner"):
+                    getattr_filter(stuff, field)
+            for user in users:
+                for field in UserListView.list_display:
+                    getattr_filter(user, field)
+
+        def benchmark(name: str):
+            result = measure(name, self.size, render, repeat=REPEAT)
+            result["cell_us"] = round(result["median_ms"] * 1000 / cells, 3)
+            results.append(result)
+
+        benchmark("getattr-filter")
+        # A configuration with many link rules, none of them for the most fields
+        rules = [{"names": (f"field{index}",)} for index in range(30)]
+        sites = {
+            site: {**config, "DETAILS_URLS": [*rules, *DEFAULT_DETAILS_URLS]}
+            for site, config in settings.BACKOFFICE.items()
+        }
+        with override_settings(BACKOFFICE=sites):
+            benchmark("getattr-filter-rules")
+
+
+# A test case per data size
+for _size in SIZES:
+    _name = f"Benchmark{_size}TestCase"
+    globals()[_name] = type(_name, (BenchmarkTestCase,), {"size": _size})
+del BenchmarkTestCase
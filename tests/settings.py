@@ -40,6 +40,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "backoffice_extensions.middleware.BackOfficeSiteMiddleware",
 ]
 TEMPLATES = [
     {
@@ -70,6 +71,8 @@ WSGI_APPLICATION = "tests.wsgi.application"
 # ------------------------------------------------------------------------------
 BACKOFFICE = {
     "default": {
+        "EXPORT_EXECUTOR": "sync",
+        "STATISTICS_MAX_WORKERS": 1,
         "STATUS_TAG_CLASSES": {
             IDLE: "warning",
             ACTIVE: "success",
@@ -1,6 +1,71 @@
+import base64
+import datetime
+import io
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.messages import get_messages
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, QuerySet, RestrictedError
+from django.db.models.deletion import Collector
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
 from test_plus import TestCase
+from test_plus.test import BaseTestCase
 
+from backoffice_extensions import imports
+from backoffice_extensions import settings as backoffice_settings
+from backoffice_extensions import statistics
+from backoffice_extensions.columns import compile_columns
+from backoffice_extensions.exports import SyncExecutor, get_executor
+from backoffice_extensions.formats import get_format
+from backoffice_extensions.fragments import (
+    get_cached_rows,
+    get_row_cache_key,
+    invalidate_rows,
+)
+from backoffice_extensions.helpers import StatisticsValue
+from backoffice_extensions.imports import RowValidator
+from backoffice_extensions.paginators import (
+    CachedCountPaginator,
+    CountlessPaginator,
+    EstimatedCountPaginator,
+)
+from backoffice_extensions.queries import get_related_lookups, is_column_path
+from backoffice_extensions.resolvers import get_details_url, reverse_or_empty
+from backoffice_extensions.search import (
+    IContainsSearchBackend,
+    SQLiteFTS5SearchBackend,
+)
+from backoffice_extensions.sidebar import get_sidebar
+from backoffice_extensions.statistics import Statistic, get_statistics
+from backoffice_extensions.templatetags.backoffice import getattr_filter, parse_value
+from backoffice_extensions.views import BackOfficeListView
+from tests.app.constants import ACTIVE, ERROR, IDLE
+from tests.app.models import Stuff
+from tests.backoffice.stuffs.views import (
+    StuffBulkUpdateView,
+    StuffDetailView,
+    StuffListView,
+)
+from tests.backoffice.users.views import ExportUsersView, UserImportView, UserListView
+from tests.backoffice.views import IndexView
 from tests.factories import StuffFactory, UserFactory
 
 User = get_user_model()
@@ -10,11 +75,13 @@ class BackofficeTestCase(TestCase):
     user_factory = UserFactory
 
     def setUp(self):
+        cache.clear()
         self.user = self.make_user()
 
     def test_get_index(self):
         with self.login(self.user):
             self.get("backoffice:index")
+            self.assertContains(self.last_response, "Staff users")
         self.response_200()
 
     def test_get_sign_in(self):
@@ -42,6 +109,108 @@ class BackofficeTestCase(TestCase):
             self.get("backoffice:user-list")
         self.response_200()
 
+    def test_get_users_list_keyset(self):
+        UserFactory.create_batch(size=11)
+        expected = list(
+            User.objects.order_by("-date_joined", "pk").values_list("pk", flat=True)
+        )
+        pages = []
+        with self.login(self.user):
+            self.get("backoffice:user-list-keyset")
+            pages.append(self.context["page_obj"])
+            while pages[-1].has_next():
+                data = {"page": pages[-1].next_page_number()}
+                self.get("backoffice:user-list-keyset", data=data)
+                pages.append(self.context["page_obj"])
+            data = {"page": pages[-1].previous_page_number()}
+            self.get("backoffice:user-list-keyset", data=data)
+            previous_page = self.context["page_obj"]
+            self.get("backoffice:user-list-keyset", data={"page": "wrong"})
+            self.response_404()
+            # Cursors with values that aren't a list or don't fit the fields
+            for values in (["n", 5], ["n", ["wrong", 1]], ["n", [None, "x"]]):
+                cursor = base64.urlsafe_b64encode(json.dumps(values).encode())
+                data = {"page": cursor.decode()}
+                self.get("backoffice:user-list-keyset", data=data)
+                self.response_404()
+        self.assertEqual(3, len(pages))
+        self.assertFalse(pages[0].has_previous())
+        self.assertEqual(expected, [user.pk for page in pages for user in page])
+        self.assertEqual(list(pages[-2]), list(previous_page))
+        self.assertTrue(previous_page.has_next())
+        self.assertTrue(previous_page.has_previous())
+
+    def test_get_users_list_countless(self):
+        UserFactory.create_batch(size=9)
+        with self.login(self.user):
+            self.get("backoffice:user-list-countless")
+            self.assertTrue(self.context["page_obj"].has_next())
+            self.assertContains(self.last_response, "Page 1")
+            self.get("backoffice:user-list-countless", data={"page": 2})
+            self.assertFalse(self.context["page_obj"].has_next())
+            self.get("backoffice:user-list-countless", data={"page": 3})
+            self.response_404()
+
+    def test_count_free_paginators(self):
+        UserFactory.create_batch(size=9)
+        queryset = User.objects.order_by("pk")
+        with self.assertNumQueries(1):
+            page = CountlessPaginator(queryset, 5).page(2)
+            self.assertEqual(5, len(page))
+            self.assertEqual((6, 10), (page.start_index(), page.end_index()))
+            self.assertFalse(page.has_next())
+        paginator = EstimatedCountPaginator(queryset, 5)
+        self.assertEqual(10, paginator.count)
+        self.assertEqual(2, paginator.num_pages)
+        self.assertFalse(paginator.count_is_estimated)
+        self.assertEqual(10, CachedCountPaginator(queryset, 5).count)
+        with self.assertNumQueries(0):
+            self.assertEqual(10, CachedCountPaginator(queryset, 5).count)
+        with self.assertNumQueries(1):
+            CachedCountPaginator(queryset.filter(is_staff=True), 5).count
+
+    @staticmethod
+    def _drop_search_index():
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS auth_user_fts")
+
+    def test_get_users_list_search(self):
+        UserFactory(username="ada@example.com", first_name="Ada", last_name="Lovelace")
+        UserFactory(username="grace@example.com", first_name="Grace")
+        with self.login(self.user):
+            self.get("backoffice:user-list", data={"search": "lovel"})
+            self.assertEqual(1, len(self.context["users"]))
+            call_command("backoffice_search_index", stdout=io.StringIO())
+            self.addCleanup(self._drop_search_index)
+            self.get("backoffice:user-list-search", data={"search": "lovel"})
+            self.assertEqual(1, len(self.context["users"]))
+            self.get("backoffice:user-list-search", data={"search": 'lovelace "OR'})
+            self.assertEqual(0, len(self.context["users"]))
+
+    def test_sqlite_fts5_search_backend_errors(self):
+        with self.assertRaises(ImproperlyConfigured):
+            SQLiteFTS5SearchBackend(Session, ["session_data"])
+        backend = SQLiteFTS5SearchBackend(User, ["username"])
+        with self.assertRaisesMessage(ImproperlyConfigured, "backoffice_search_index"):
+            backend.filter(User.objects.all(), "ada")
+
+    def test_icontains_search_backend(self):
+        user = UserFactory(first_name="Ada")
+        StuffFactory.create_batch(size=2, owner=user, status=IDLE)
+        StuffFactory(status=ACTIVE)
+        backend = IContainsSearchBackend(User, ["first_name", "stuff__status"])
+        self.assertEqual({"stuff__status"}, backend.to_many_fields)
+        queryset = backend.filter(User.objects.all(), IDLE)
+        self.assertEqual([user], list(queryset))
+        self.assertNotIn("DISTINCT", str(queryset.query))
+        self.assertEqual(
+            [user], list(backend.filter(User.objects.all(), user.first_name))
+        )
+        # The rows duplicated by a to-many filter are removed
+        queryset = User.objects.filter(stuff__status=IDLE)
+        self.assertEqual([user], list(backend.filter(queryset, user.first_name)))
+        self.assertEqual([user], list(backend.filter(queryset, IDLE)))
+
     def test_get_user_create(self):
         with self.login(self.user):
             self.get("backoffice:user-create")
@@ -81,20 +250,805 @@ class BackofficeTestCase(TestCase):
             self.get("backoffice:user-export")
         self.response_200()
 
+    def test_get_streaming_export_users(self):
+        UserFactory.create_batch(size=20)
+        with self.login(self.user):
+            response = self.get("backoffice:user-export")
+            streaming_response = self.get("backoffice:user-export-stream")
+        self.assertTrue(streaming_response.streaming)
+        self.assertEqual(
+            response.content.decode(),
+            b"".join(streaming_response.streaming_content).decode(),
+        )
+
+    def test_get_export_users_values_list(self):
+        UserFactory.create_batch(size=20)
+        with self.login(self.user):
+            with self.assertNumQueries(3):
+                response = self.get("backoffice:user-export")
+            with mock.patch.object(ExportUsersView, "use_values_list", False):
+                instances_response = self.get("backoffice:user-export")
+        self.assertEqual(response.content, instances_response.content)
+
+    def test_get_export_users_groups(self):
+        group = Group.objects.create(name="Staff")
+        for user in UserFactory.create_batch(size=24):
+            user.groups.add(group)
+        with self.login(self.user):
+            # Session, user and a query for the rows plus one per chunk for groups
+            with self.assertNumQueries(2 + 1 + 3):
+                response = self.get("backoffice:user-export-groups")
+        lines = response.content.decode().splitlines()
+        self.assertEqual(26, len(lines))
+        self.assertEqual(24, sum(line.endswith(",Staff") for line in lines))
+
+    def test_is_column_path(self):
+        self.assertTrue(is_column_path(Stuff, "status"))
+        self.assertTrue(is_column_path(Stuff, "owner_id"))
+        self.assertTrue(is_column_path(Stuff, "owner__email"))
+        self.assertFalse(is_column_path(Stuff, "owner"))
+        self.assertFalse(is_column_path(Stuff, "owner__groups__name"))
+        self.assertFalse(is_column_path(User, "groups"))
+        self.assertFalse(is_column_path(User, "stuff__status"))
+        self.assertFalse(is_column_path(User, "get_full_name"))
+
+    def test_post_import_users(self):
+        UserFactory(username="taken")
+        content = (
+            "username,first_name,last_name,extra\n"
+            "ada,Ada,Lovelace,x\n"
+            ",Empty,Username,x\n"
+            "taken,Taken,Username,x\n"
+            "alan,Alan,Turing,x\n"
+            "grace,Grace,Hopper,x\n"
+            "grace,Grace,Again,x\n"
+        )
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with self.login(self.user), override_settings(MEDIA_ROOT=media_root):
+            self.get("backoffice:user-import")
+            self.response_200()
+            upload = SimpleUploadedFile("users.csv", content.encode())
+            self.post("backoffice:user-import", data={"file": upload, "dry_run": "1"})
+            self.assertEqual((6, 3, 3), self.context["result"][:3])
+            self.assertEqual(2, User.objects.count())
+            upload = SimpleUploadedFile("users.csv", content.encode())
+            self.post("backoffice:user-import", data={"file": upload})
+            result = self.context["result"]
+            self.assertEqual((6, 3, 3), result[:3])
+            self.assertEqual([2, 3, 6], [row for row, _ in result.preview])
+            self.assertEqual(
+                {"ada", "grace", "alan"},
+                set(
+                    User.objects.exclude(pk__in=[self.user.pk]).values_list(
+                        "username", flat=True
+                    )
+                )
+                - {"taken"},
+            )
+            # The default values of the fields not in the form are inserted
+            ada = User.objects.get(username="ada")
+            self.assertTrue(ada.is_active)
+            self.assertIsNotNone(ada.date_joined)
+            response = self.client.get(self.context["report_url"])
+            report = b"".join(response.streaming_content).decode().splitlines()
+            self.assertEqual(
+                "row,errors,username,first_name,last_name,extra", report[0]
+            )
+            self.assertEqual(4, len(report))
+            upload = SimpleUploadedFile("users.txt", content.encode())
+            self.post("backoffice:user-import", data={"file": upload})
+            self.assertTrue(self.context["form"].errors)
+
+    def test_row_validator(self):
+        form_class = UserImportView().get_validation_form_class()
+        for versions in (imports.REUSABLE_FORMS_VERSIONS, ((1, 0), (1, 0))):
+            with mock.patch.object(imports, "REUSABLE_FORMS_VERSIONS", versions):
+                validator = RowValidator(form_class)
+            self.assertEqual(versions[0] != (1, 0), validator.form is not None)
+            form = validator.validate({"username": "ada", "first_name": "Ada"})
+            self.assertTrue(form.is_valid())
+            instance = form.instance
+            form = validator.validate({"username": "", "first_name": "Empty"})
+            self.assertEqual(["username"], list(form.errors))
+            self.assertEqual("ada", instance.username)
+            self.assertIsNot(instance, form.instance)
+
+    def test_post_import_users_upsert(self):
+        UserFactory(username="ada", first_name="Augusta")
+        group = Group.objects.create(name="Pioneers")
+        lines = [
+            json.dumps(
+                {
+                    "username": "ada",
+                    "first_name": "Ada",
+                    "last_name": "L",
+                    "groups": [group.pk],
+                }
+            ),
+            json.dumps({"username": "grace", "first_name": "Grace", "last_name": "H"}),
+        ]
+        upload = SimpleUploadedFile("users.jsonl", "\n".join(lines).encode())
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with self.login(self.user), override_settings(MEDIA_ROOT=media_root):
+            self.post("backoffice:user-import-upsert", data={"file": upload})
+        self.assertEqual((2, 2, 0), self.context["result"][:3])
+        ada = User.objects.get(username="ada")
+        self.assertEqual("Ada", ada.first_name)
+        # The many to many values are saved in the existing rows too
+        self.assertEqual([group], list(ada.groups.all()))
+        self.assertTrue(User.objects.filter(username="grace").exists())
+
+    def test_get_export_users_formats(self):
+        UserFactory.create_batch(size=20)
+        with self.login(self.user):
+            response = self.get("backoffice:user-export", data={"format": "jsonl"})
+            self.get("backoffice:user-export", data={"format": "unknown"})
+            self.response_404()
+        self.assertEqual(
+            'attachment; filename="users.jsonl"', response["Content-Disposition"]
+        )
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(21, len(lines))
+        self.assertEqual(
+            ["id", "email", "first_name", "last_name", "is_superuser", "is_staff"],
+            list(json.loads(lines[0]))[:6],
+        )
+
+    @skipIf(get_format("parquet") is None, "pyarrow is not installed")
+    def test_write_parquet_late_values(self):
+        export_format = get_format("parquet")
+        export_format.batch_size = 2
+        # The amount and note columns only have values after the first batch
+        rows = [[1, None, None], [2, None, None], [3, 1.5, None], [4, None, 7]]
+        file = io.BytesIO()
+        export_format.write(["id", "amount", "note"], rows, file)
+        file.seek(0)
+        self.assertEqual(
+            [
+                {"id": 3, "amount": 1.5, "note": None},
+                {"id": 4, "amount": None, "note": 7},
+            ],
+            list(export_format.read(file))[2:],
+        )
+
+    @skipIf(get_format("parquet") is None, "pyarrow is not installed")
+    def test_write_parquet_mixed_types(self):
+        export_format = get_format("parquet")
+        export_format.batch_size = 2
+        rows = [[1, "a"], [2, 3], [3, Decimal("1.5")], [4, None]]
+        file = io.BytesIO()
+        export_format.write(["id", "value"], rows, file)
+        file.seek(0)
+        self.assertEqual(
+            ["a", "3", "1.5", None],
+            [row["value"] for row in export_format.read(file)],
+        )
+        # The types can't change once the schema is written
+        rows = [[1, 1], [2, 2], [3, "a"]]
+        with self.assertRaises(ValueError):
+            export_format.write(["id", "value"], rows, io.BytesIO())
+
+    @skipIf(get_format("xlsx") is None, "openpyxl is not installed")
+    def test_write_xlsx(self):
+        export_format = get_format("xlsx")
+        joined = timezone.make_aware(datetime.datetime(2023, 7, 1, 12, 30))
+        rows = [[1, "Ada", joined, Decimal("1.5"), None], [2, "Alan", None, 2, True]]
+        file = io.BytesIO()
+        export_format.write(["id", "name", "joined", "amount", "active"], rows, file)
+        file.seek(0)
+        self.assertEqual(
+            [
+                {
+                    "id": 1,
+                    "name": "Ada",
+                    "joined": timezone.make_naive(joined),
+                    "amount": 1.5,
+                    "active": None,
+                },
+                {
+                    "id": 2,
+                    "name": "Alan",
+                    "joined": None,
+                    "amount": 2,
+                    "active": True,
+                },
+            ],
+            list(export_format.read(file)),
+        )
+
+    def test_get_background_export_users(self):
+        UserFactory.create_batch(size=20)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with self.login(self.user), override_settings(MEDIA_ROOT=media_root):
+            response = self.get("backoffice:user-export")
+            job = self.get("backoffice:user-export-background").json()
+            self.assertEqual(202, self.last_response.status_code)
+            self.assertEqual(21, job["total"])
+            status = self.get("backoffice:export-status", job_id=job["id"]).json()
+            self.assertEqual("done", status["status"])
+            self.assertEqual(21, status["rows"])
+            download = self.client.get(status["download_url"])
+            self.assertEqual(response.content, b"".join(download.streaming_content))
+            download.close()
+            call_command("backoffice_clear_exports", stdout=io.StringIO())
+            self.assertEqual(1, len(os.listdir(f"{media_root}/backoffice/exports")))
+            call_command(
+                "backoffice_clear_exports", expiration=-60, stdout=io.StringIO()
+            )
+            self.assertEqual([], os.listdir(f"{media_root}/backoffice/exports"))
+        other_user = self.make_user("other")
+        with self.login(other_user):
+            self.get("backoffice:export-status", job_id=job["id"])
+        self.response_404()
+
+    def test_get_users_list_profiling(self):
+        UserFactory.create_batch(size=20)
+        with self.login(self.user), mock.patch.object(
+            UserListView, "profiling", True
+        ), mock.patch("backoffice_extensions.profiling.log_metrics") as hook:
+            response = self.get("backoffice:user-list", data={"search": "a"})
+        self.response_200()
+        metrics = [
+            metric.split(";")[0] for metric in response["Server-Timing"].split(", ")
+        ]
+        for name in ("queryset", "count", "page", "render", "sidebar", "total"):
+            self.assertIn(name, metrics)
+        self.assertIn("column-username", metrics)
+        profile = hook.call_args.args[0]
+        self.assertEqual("UserListView", profile.name)
+        self.assertEqual(1, profile.timings["count"].queries)
+
+    def test_get_users_async(self):
+        UserFactory.create_batch(size=20, first_name="Ada")
+        self.get("backoffice:user-list-async")
+        self.response_302()
+        with self.login(self.user):
+            self.get("backoffice:user-list-async", data={"search": "ada"})
+            self.response_200()
+            self.assertEqual(15, len(self.context["users"]))
+            self.assertEqual(20, self.context["paginator"].count)
+            self.get("backoffice:user-list-async", data={"page": "last"})
+            self.assertEqual(6, len(self.context["users"]))
+            self.get("backoffice:user-list-async", data={"page": 5})
+            self.response_404()
+            self.get("backoffice:user-detail-async", pk=self.user.pk)
+            self.assertContains(self.last_response, self.user.email)
+            self.get("backoffice:user-detail-async", pk=0)
+            self.response_404()
+            response = self.get("backoffice:user-export-async")
+            self.assertEqual(22, len(response.content.decode().splitlines()))
+
+    async def test_get_async_index(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(self.reverse("backoffice:index-async"))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, response.context["statistics"]["Users"].value)
+        self.assertIn("Sign ups", response.context["series"])
+
+    def test_get_statistics(self):
+        StuffFactory.create_batch(size=3)
+        statistics = IndexView.statistics
+        # The aggregates over users are merged in a single query
+        with self.assertNumQueries(2):
+            values = get_statistics(statistics)
+        self.assertEqual(list(statistics), list(values))
+        self.assertEqual(4, values["Users"].value)
+        self.assertEqual(3, values["Stuffs"].value)
+        self.assertIsNotNone(values["Users"].computed_at)
+        StuffFactory()
+        # The stale value is returned, and refreshed for the next time
+        with self.assertNumQueries(1):
+            values = get_statistics(statistics)
+        self.assertEqual(3, values["Stuffs"].value)
+        with self.assertNumQueries(1):
+            values = get_statistics(statistics)
+        self.assertEqual(4, values["Stuffs"].value)
+        # The same name and aggregate over other query is cached apart
+        staff = {"Users": Statistic(User.objects.filter(is_staff=True), Count("id"))}
+        self.assertEqual(0, get_statistics(staff)["Users"].value)
+
+    def test_get_statistics_callables(self):
+        # The lambdas with the same path are cached by the query they build
+        users = [
+            {
+                "Users": Statistic(
+                    lambda staff=staff: User.objects.filter(is_staff=staff), Count("id")
+                )
+            }
+            for staff in (True, False)
+        ]
+        for staff, staff_statistics in zip((True, False), users):
+            self.assertEqual(
+                User.objects.filter(is_staff=staff).count(),
+                get_statistics(staff_statistics)["Users"].value,
+            )
+        self.assertNotEqual(
+            users[0]["Users"].get_cache_key("Users"),
+            users[1]["Users"].get_cache_key("Users"),
+        )
+        # Or by the given key
+        keyed = Statistic(
+            lambda: User.objects.filter(is_staff=True), Count("id"), key="staff"
+        )
+        self.assertEqual("staff", keyed.get_query_key())
+        self.assertIsNone(StatisticsValue(1).computed_at)
+
+    def test_update_rollups(self):
+        today = timezone.now()
+        for days in (1, 1, 3, 10):
+            UserFactory(date_joined=today - datetime.timedelta(days=days))
+        rollup = IndexView.rollups["Sign ups"]
+        call_command("backoffice_rollups", stdout=io.StringIO())
+        points = dict(rollup.get_series("day").points)
+        self.assertEqual(5, sum(points.values()))
+        self.assertEqual(2, points[timezone.localdate(today) - datetime.timedelta(1)])
+        UserFactory(date_joined=today + datetime.timedelta(days=1))
+        # Only the buckets of the new rows (and of the watermark) are recomputed
+        self.assertLess(rollup.update(), rollup.update(full=True))
+        self.assertEqual(6, sum(dict(rollup.get_series("day").points).values()))
+        # Deletions are only detected with a full update
+        User.objects.filter(date_joined__lt=today - datetime.timedelta(days=2)).delete()
+        rollup.update(full=True)
+        self.assertEqual(4, sum(dict(rollup.get_series("day").points).values()))
+        with self.login(self.user):
+            self.get("backoffice:index")
+        self.assertContains(self.last_response, "Sign ups")
+
     def test_get_stuffs_list(self):
         StuffFactory.create_batch(size=20)
         with self.login(self.user):
             self.get("backoffice:stuff-list")
         self.response_200()
 
+    def test_get_stuffs_list_queries(self):
+        StuffFactory.create_batch(size=2)
+        with self.login(self.user):
+            self.get("backoffice:stuff-list")
+            with self.assertNumQueries(4):
+                self.get("backoffice:stuff-list")
+            StuffFactory.create_batch(size=13)
+            with self.assertNumQueries(4):
+                self.get("backoffice:stuff-list")
+
+    def test_get_related_lookups(self):
+        select_related, prefetch_related = get_related_lookups(
+            Stuff, ["id", "status", ("owner", "Owner"), "owner_id", "owner__groups"]
+        )
+        self.assertEqual(["owner"], select_related)
+        self.assertEqual(["owner__groups"], prefetch_related)
+        select_related, prefetch_related = get_related_lookups(
+            User, ["username", "stuff_set", "groups"]
+        )
+        self.assertEqual([], select_related)
+        self.assertEqual(["stuff_set", "groups"], prefetch_related)
+
+    def test_compiled_columns(self):
+        stuff = StuffFactory()
+        fields = ["id", "status", "owner", "owner_id", "__str__"]
+        for column in compile_columns(Stuff, fields):
+            self.assertEqual(getattr_filter(stuff, column.field), column.render(stuff))
+        fields = ["pk", "is_active", "last_login", "date_joined", "groups", "stuff_set"]
+        for column in compile_columns(User, fields):
+            self.assertEqual(
+                getattr_filter(stuff.owner, column.field), column.render(stuff.owner)
+            )
+        # The rules of a name are applied in the order they are declared
+        rules = [{"names": ("owner",)}, {"names": ("owner",), "lookup_field": "email"}]
+        with override_settings(BACKOFFICE={"default": {"DETAILS_URLS": rules}}):
+            value = getattr_filter(stuff, "owner")
+            self.assertEqual(value, compile_columns(Stuff, ["owner"])[0].render(stuff))
+            self.assertEqual(
+                f'<a href="/backoffice/users/{stuff.owner.pk}/">{stuff.owner}</a>',
+                value,
+            )
+            self.assertEqual(stuff.pk, getattr_filter(stuff, "id"))
+
+    def test_get_details_url(self):
+        for pk in (1, 42, "42"):
+            self.assertEqual(
+                reverse("backoffice:stuff-detail", kwargs={"pk": pk}),
+                get_details_url("backoffice:stuff-detail", "pk", pk),
+            )
+        for _ in range(2):
+            with self.assertRaises(NoReverseMatch):
+                get_details_url("backoffice:group-detail", "pk", 1)
+            # The pattern rejects the sentinel, so each value is reversed
+            self.assertEqual(
+                "/backoffice/users/short/42/",
+                get_details_url("backoffice:user-detail-short", "pk", 42),
+            )
+            with self.assertRaises(NoReverseMatch):
+                get_details_url("backoffice:user-detail-short", "pk", 1234567)
+        self.assertEqual("/backoffice/", reverse_or_empty("backoffice:index"))
+        self.assertEqual("", reverse_or_empty("backoffice:unknown"))
+        with override_settings(ROOT_URLCONF="tests.backoffice.urls"):
+            self.assertEqual("/", reverse_or_empty("index"))
+            self.assertEqual("/stuffs/1/", get_details_url("stuff-detail", "pk", 1))
+        self.assertEqual("/backoffice/", reverse_or_empty("backoffice:index"))
+
+    def test_get_sidebar(self):
+        sidebar_config = [
+            {
+                "label": "Other",
+                "sections": {
+                    "user": {"label": "User", "permission": None},
+                    "stuff": {"label": "Stuff", "permission": "app.view_stuff"},
+                },
+            }
+        ]
+        sites = {**settings.BACKOFFICE, "other": {"SIDEBAR_CONFIG": sidebar_config}}
+        with override_settings(BACKOFFICE=sites), backoffice_settings.override("other"):
+            user = User.objects.get(pk=self.user.pk)
+            sidebar = get_sidebar(user)
+            self.assertEqual([("/backoffice/users/", "User")], sidebar[0][1])
+            with self.assertNumQueries(0):
+                self.assertEqual(sidebar, get_sidebar(user))
+            self.user.user_permissions.add(
+                Permission.objects.get(codename="view_stuff")
+            )
+            user = User.objects.get(pk=self.user.pk)
+            self.assertEqual(2, len(get_sidebar(user)[0][1]))
+            self.assertEqual("Other", get_sidebar(user)[0][0])
+        # The sidebar of each site is cached apart
+        self.assertEqual("Data", get_sidebar(user)[0][0])
+
+    def test_get_users_other_site(self):
+        other = {"TITLE": "Other", "URL_NAMESPACE": "other"}
+        sites = {
+            **settings.BACKOFFICE,
+            "other": {**settings.BACKOFFICE["default"], **other},
+        }
+        with self.login(self.user), override_settings(BACKOFFICE=sites):
+            self.get("/other/users/")
+            self.response_200()
+            self.assertEqual("Other", self.context["backoffice_title"])
+            self.assertContains(self.last_response, 'href="/other/stuffs/"')
+            self.assertEqual("default", backoffice_settings.get_site())
+            self.get("backoffice:user-list")
+            self.assertEqual("backoffice", self.context["backoffice_title"])
+            self.assertNotContains(self.last_response, 'href="/other/stuffs/"')
+
+    def test_site_settings(self):
+        sites = {
+            "default": {"TITLE": "Default"},
+            "other": {
+                "NONE_VALUE": "?",
+                "DETAILS_URLS": [
+                    {"names": ("owner",), "follow": False},
+                    {"names": ("owner", "name"), "lookup_field": "slug"},
+                ],
+            },
+        }
+        with override_settings(BACKOFFICE=sites):
+            self.assertEqual("Default", backoffice_settings.TITLE)
+            self.assertEqual("-", backoffice_settings.NO_IMAGE_VALUE)
+            with backoffice_settings.override("other"):
+                self.assertEqual("backoffice", backoffice_settings.TITLE)
+                self.assertEqual("?", backoffice_settings.NO_IMAGE_VALUE)
+                self.assertEqual("?", parse_value(None))
+                self.assertEqual(
+                    {
+                        "owner": ((False, "pk"), (True, "slug")),
+                        "name": ((True, "slug"),),
+                    },
+                    backoffice_settings.get_settings().details_urls_index,
+                )
+            self.assertIs(
+                backoffice_settings.get_settings("other"),
+                backoffice_settings.get_settings("other"),
+            )
+            with override_settings(BACKOFFICE_SITE="other"):
+                self.assertEqual("?", backoffice_settings.NONE_VALUE)
+        self.assertEqual("-", backoffice_settings.NONE_VALUE)
+        with self.assertRaises(AttributeError):
+            backoffice_settings.UNKNOWN
+
+    def test_post_stuffs_bulk_delete(self):
+        stuffs = StuffFactory.create_batch(size=5)
+        data = {"selection": [stuffs[0].pk, stuffs[1].pk, "wrong"]}
+        with self.login(self.user):
+            self.get("backoffice:stuff-list")
+            self.assertContains(self.last_response, 'name="selection"', count=5)
+            self.post("backoffice:stuff-bulk-delete", data=data)
+            self.response_302()
+            self.assertEqual(3, Stuff.objects.count())
+            self.post("backoffice:stuff-bulk-delete", data={"select_across": 1})
+        self.assertEqual(0, Stuff.objects.count())
+
+    def test_post_stuffs_bulk_delete_restricted(self):
+        stuffs = StuffFactory.create_batch(size=3)
+        delete = Stuff.delete
+
+        def restricted_delete(instance, *args, **kwargs):
+            if instance.pk == stuffs[0].pk:
+                raise RestrictedError("Restricted", {instance})
+            return delete(instance, *args, **kwargs)
+
+        error = RestrictedError("Restricted", set(stuffs))
+        with self.login(self.user), mock.patch.object(
+            Collector, "can_fast_delete", return_value=False
+        ), mock.patch.object(QuerySet, "delete", side_effect=error), mock.patch.object(
+            Stuff, "delete", restricted_delete
+        ):
+            self.post("backoffice:stuff-bulk-delete", data={"select_across": 1})
+            self.response_302()
+        self.assertEqual([stuffs[0]], list(Stuff.objects.all()))
+        self.assertEqual(
+            ["2 stuffs deleted", f"1 stuffs can't be deleted: {stuffs[0]}"],
+            [str(message) for message in get_messages(self.last_response.wsgi_request)],
+        )
+
+    def test_post_stuffs_bulk_update(self):
+        stuffs = StuffFactory.create_batch(size=3, status=IDLE)
+        modified = stuffs[0].modified
+        selection = {"selection": [stuffs[0].pk, stuffs[1].pk]}
+        with self.login(self.user):
+            self.post("backoffice:stuff-bulk-update", data=selection)
+            self.response_200()
+            self.assertEqual(2, self.context["count"])
+            self.assertContains(self.last_response, f'value="{stuffs[1].pk}"')
+            self.post(
+                "backoffice:stuff-bulk-update",
+                data={**selection, "apply": "1", "status": "unknown"},
+            )
+            self.response_200()
+            self.assertTrue(self.context["form"].errors)
+            self.post(
+                "backoffice:stuff-bulk-update",
+                data={**selection, "apply": "1", "status": ERROR},
+            )
+        self.response_302()
+        self.assertEqual(
+            [ERROR, ERROR, IDLE],
+            list(Stuff.objects.order_by("pk").values_list("status", flat=True)),
+        )
+        stuffs[0].refresh_from_db()
+        self.assertGreater(stuffs[0].modified, modified)
+
+    def test_post_stuffs_bulk_update_across(self):
+        StuffFactory.create_batch(size=3, status=IDLE)
+        data = {"select_across": "1", "apply": "1", "status": ACTIVE}
+        with self.login(self.user):
+            with CaptureQueriesContext(connection) as queries:
+                self.post("backoffice:stuff-bulk-update", data=data)
+            # An UPDATE per chunk of 2 rows
+            updates = [query for query in queries if query["sql"].startswith("UPDATE")]
+            self.assertEqual(2, len(updates))
+            self.assertEqual(
+                {ACTIVE}, set(Stuff.objects.values_list("status", flat=True))
+            )
+            data["status"] = ERROR
+            with mock.patch.object(StuffBulkUpdateView, "use_save", True):
+                self.post("backoffice:stuff-bulk-update", data=data)
+        self.assertEqual({ERROR}, set(Stuff.objects.values_list("status", flat=True)))
+
+    def test_post_stuffs_bulk_update_row_values(self):
+        stuffs = StuffFactory.create_batch(size=3, status=IDLE)
+        owner = UserFactory()
+
+        def get_row_values(instance, values):
+            # Other fields than the ones of the form, only for some rows
+            if instance.pk == stuffs[0].pk:
+                return {**values, "owner": owner}
+            return values
+
+        data = {"select_across": "1", "apply": "1", "status": ERROR}
+        with self.login(self.user), mock.patch.object(
+            StuffBulkUpdateView, "row_values", True
+        ), mock.patch.object(
+            StuffBulkUpdateView, "get_row_values", side_effect=get_row_values
+        ):
+            self.post("backoffice:stuff-bulk-update", data=data)
+        self.response_302()
+        self.assertEqual({ERROR}, set(Stuff.objects.values_list("status", flat=True)))
+        self.assertEqual(
+            [owner.pk, stuffs[1].owner_id, stuffs[2].owner_id],
+            list(Stuff.objects.order_by("pk").values_list("owner", flat=True)),
+        )
+
+    def test_post_users_bulk_delete(self):
+        users = UserFactory.create_batch(size=5, first_name="Dummy")
+        StuffFactory(owner=users[0])
+        data = {"select_across": 1}
+        with self.login(self.user):
+            response = self.client.post(
+                self.reverse("backoffice:user-bulk-delete") + "?search=dummy", data
+            )
+        self.assertRedirects(
+            response, "/backoffice/users/?search=dummy", fetch_redirect_response=False
+        )
+        self.assertEqual([self.user], list(User.objects.all()))
+        self.assertEqual(0, Stuff.objects.count())
+
+    def test_get_stuffs_list_cached_rows(self):
+        stuff = StuffFactory(status=IDLE)
+        key = get_row_cache_key(Stuff, stuff.pk)
+        with self.login(self.user), mock.patch.object(
+            StuffListView, "cache_rows", True
+        ):
+            self.get("backoffice:stuff-list")
+            self.assertIsNotNone(cache.get(key))
+            # Updates don't send signals, but the values shown are checked
+            Stuff.objects.filter(pk=stuff.pk).update(status=ERROR)
+            self.get("backoffice:stuff-list")
+            self.assertContains(self.last_response, ">Error</span>")
+            stuff.refresh_from_db()
+            stuff.save()
+            self.assertIsNone(cache.get(key))
+            self.get("backoffice:stuff-list")
+            self.assertContains(self.last_response, ">Error</span>")
+
+    def test_cached_rows_signals(self):
+        group = Group.objects.create(name="Editors")
+        key = get_row_cache_key(Group, group.pk)
+        # The signals are connected when the view class is defined
+        type(
+            "GroupListView",
+            (BackOfficeListView,),
+            {"queryset": Group.objects.all(), "cache_rows": True},
+        )
+        cache.set(key, "row")
+        group.save()
+        self.assertIsNone(cache.get(key))
+        # The updates invalidate the rows of any model
+        permission = Permission.objects.first()
+        key = get_row_cache_key(Permission, permission.pk)
+        cache.set(key, "row")
+        invalidate_rows(Permission.objects.filter(pk=permission.pk))
+        self.assertIsNone(cache.get(key))
+
+    def test_get_cached_rows_version(self):
+        users = UserFactory.create_batch(size=3)
+        columns = compile_columns(User, ["id", "username"])
+        render = mock.Mock(side_effect=lambda obj: obj.username)
+        get_cached_rows(users, columns, render, version_field="last_login")
+        with self.assertNumQueries(0):
+            rows = get_cached_rows(users, columns, render, version_field="last_login")
+        self.assertEqual(3, render.call_count)
+        self.assertEqual(users[0].username, rows[users[0].pk])
+        users[0].last_login = timezone.now()
+        get_cached_rows(users, columns, render, version_field="last_login")
+        self.assertEqual(4, render.call_count)
+        # The rows are rendered again when the values shown or the view change
+        users[1].username = "changed"
+        get_cached_rows(users, columns, render, version_field="last_login")
+        self.assertEqual(5, render.call_count)
+        get_cached_rows(users, columns, render, version_field="last_login", view="x")
+        self.assertEqual(8, render.call_count)
+
+    def test_get_cached_rows_unversioned(self):
+        users = UserFactory.create_batch(size=3)
+        columns = compile_columns(User, ["id", "username"])
+        render = mock.Mock(side_effect=lambda obj: obj.username)
+        with mock.patch.object(cache, "set_many") as set_many:
+            get_cached_rows(users, columns, render)
+        self.assertEqual(60, set_many.call_args.args[1])
+        sites = {
+            "default": {
+                **settings.BACKOFFICE["default"],
+                "ROW_CACHE_UNVERSIONED_TIMEOUT": 0,
+            }
+        }
+        with override_settings(BACKOFFICE=sites):
+            self.assertEqual({}, get_cached_rows(users, columns, render))
+            self.assertEqual(
+                3, len(get_cached_rows(users, columns, render, version_field="id"))
+            )
+
     def test_get_stuffs_detail(self):
         stuff = StuffFactory()
         with self.login(self.user):
             self.get("backoffice:stuff-detail", pk=stuff.pk)
         self.response_200()
 
+    def test_get_stuffs_detail_conditional(self):
+        stuff = StuffFactory()
+        with self.login(self.user), mock.patch.object(
+            StuffDetailView, "conditional_get", True
+        ):
+            self.get("backoffice:stuff-detail", pk=stuff.pk)
+            self.response_200()
+            etag = self.last_response["ETag"]
+            self.assertIn("Last-Modified", self.last_response)
+            # The session, the user and the version
+            with self.assertNumQueries(3):
+                self.get(
+                    "backoffice:stuff-detail",
+                    pk=stuff.pk,
+                    extra={"HTTP_IF_NONE_MATCH": etag},
+                )
+            self.assertEqual(304, self.last_response.status_code)
+            stuff.status = ERROR
+            stuff.save()
+            self.get(
+                "backoffice:stuff-detail",
+                pk=stuff.pk,
+                extra={"HTTP_IF_NONE_MATCH": etag},
+            )
+            self.response_200()
+            self.assertNotEqual(etag, self.last_response["ETag"])
+
+    def test_get_stuffs_list_conditional(self):
+        stuffs = StuffFactory.create_batch(size=3)
+        url = self.reverse("backoffice:stuff-list")
+        with self.login(self.user), mock.patch.object(
+            StuffListView, "conditional_get", True
+        ):
+            etag = self.client.get(url)["ETag"]
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(304, response.status_code)
+            # The filters are part of the ETag
+            response = self.client.get(url, {"page": 1}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(200, response.status_code)
+            # Deletions change the count of the rows
+            Stuff.objects.filter(pk=stuffs[0].pk).delete()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(200, response.status_code)
+
     def test_get_stuffs_delete(self):
         stuff = StuffFactory()
         with self.login(self.user):
             self.get("backoffice:stuff-delete", pk=stuff.pk)
         self.response_302()
+
+
+class WorkersTestCase(TransactionTestCase, BaseTestCase):
+    """Tests of the work done in other threads, which need the data committed."""
+
+    user_factory = UserFactory
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.make_user()
+
+    def test_get_background_export_users_thread(self):
+        group = Group.objects.create(name="Exported")
+        group.user_set.add(*UserFactory.create_batch(size=3))
+        UserFactory.create_batch(size=2)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        sites = {
+            "default": {**settings.BACKOFFICE["default"], "EXPORT_EXECUTOR": "thread"}
+        }
+        with self.login(self.user), override_settings(
+            MEDIA_ROOT=media_root, BACKOFFICE=sites
+        ):
+            executor = get_executor()
+            self.assertIsInstance(executor, ThreadPoolExecutor)
+            job = self.get(
+                "backoffice:user-export-background-group", group_pk=group.pk
+            ).json()
+            self.assertEqual(202, self.last_response.status_code)
+            executor.shutdown(wait=True)
+            status = self.get("backoffice:export-status", job_id=job["id"]).json()
+            self.assertEqual("done", status["status"])
+            # The URL kwargs of the request are used to filter the export
+            self.assertEqual(3, status["rows"])
+        self.assertIsInstance(get_executor(), SyncExecutor)
+        # The state of the jobs can't be shared with other processes
+        sites = {"default": {"EXPORT_EXECUTOR": "process"}}
+        with override_settings(BACKOFFICE=sites), self.assertRaises(
+            ImproperlyConfigured
+        ):
+            get_executor()
+
+    def test_get_statistics_workers(self):
+        StuffFactory.create_batch(size=3)
+        sites = {
+            "default": {**settings.BACKOFFICE["default"], "STATISTICS_MAX_WORKERS": 2}
+        }
+        with override_settings(BACKOFFICE=sites):
+            executor = statistics._get_executor()
+            self.assertIsInstance(executor, ThreadPoolExecutor)
+            # The groups of users and stuffs are computed in the workers
+            values = get_statistics(IndexView.statistics)
+            self.assertEqual(4, values["Users"].value)
+            self.assertEqual(3, values["Stuffs"].value)
+            StuffFactory()
+            # The stale value is returned while it's refreshed in a worker
+            self.assertEqual(3, get_statistics(IndexView.statistics)["Stuffs"].value)
+            executor.shutdown(wait=True)
+        self.assertEqual(4, get_statistics(IndexView.statistics)["Stuffs"].value)
@@ -2,4 +2,6 @@ from django.urls import include, path
 
 urlpatterns = [
     path("backoffice/", include("tests.backoffice.urls", namespace="backoffice")),
+    # Another site, with its own URL_NAMESPACE
+    path("other/", include("tests.backoffice.urls", namespace="other")),
 ]